@@ -13,6 +13,24 @@ from .models import (
     ProductCategory, Product, ProductStatus, 
     BlogPost, BlogCategory, PriceList, ContactFormSubmission, PageSEO, Enquiry
 )
+from . import image_jobs, search
+
+
+class SearchIndexMixin:
+    """
+    Admin search through the full-text index instead of LIKE scans over
+    long text (Summernote HTML, enquiry messages). ``search_fields`` should
+    list only short columns; rows matching them by substring are still found
+    too.
+    """
+    search_index_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        matching = search.matching_ids(self.search_index_kind, search_term)
+        if matching is not None:
+            results = results | queryset.filter(pk__in=matching)
+        return results, may_have_duplicates
 
 # Custom admin filters
 class ResponseStatusFilter(admin.SimpleListFilter):
@@ -68,16 +86,26 @@ class ProductCategoryAdmin(ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(ModelAdmin):
-    list_display = ['name','sku', 'category', 'status_badge', 'image_preview', 'created_at']
+class ProductAdmin(SearchIndexMixin, ModelAdmin):
+    list_display = ['name','sku', 'category', 'status_badge', 'image_preview', 'image_status_badge', 'created_at']
     list_filter = [
         ('category', ChoicesDropdownFilter),
         ('status', ChoicesDropdownFilter),
+        ('image_status', ChoicesDropdownFilter),
         ('created_at', RangeDateFilter)
     ]
-    search_fields = ['name', 'description']
+    search_fields = ['name', 'sku']
+    search_index_kind = search.PRODUCT
     prepopulated_fields = {'slug': ('name',)}
-    
+    readonly_fields = ['image_status', 'image_error']
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        if obj and obj.image_upload and not obj.image:
+            # A first image waiting to be processed counts as one.
+            form.base_fields['image'].required = False
+        return form
+
     @display(description="Status")
     def status_badge(self, obj):
         if obj.status:
@@ -98,6 +126,28 @@ class ProductAdmin(ModelAdmin):
             )
         return format_html('<span class="text-gray-400">No image</span>')
 
+    @display(description="Image processing")
+    def image_status_badge(self, obj):
+        colors = {
+            'pending': 'bg-yellow-100 text-yellow-800',
+            'processing': 'bg-blue-100 text-blue-800',
+            'ready': 'bg-green-100 text-green-800',
+            'failed': 'bg-red-100 text-red-800',
+        }
+        return format_html(
+            '<span class="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium {}" title="{}">{}</span>',
+            colors.get(obj.image_status, 'bg-gray-100 text-gray-800'),
+            obj.image_error,
+            obj.get_image_status_display()
+        )
+
+    @action(description="Process images again")
+    def reprocess_images(self, request, queryset):
+        queued = image_jobs.requeue(queryset)
+        self.message_user(request, f'{queued} product images queued for processing.')
+
+    actions = ['reprocess_images']
+
 @admin.register(ProductStatus)
 class ProductStatusAdmin(ModelAdmin):
     list_display = ['name', 'product_count']
@@ -126,7 +176,7 @@ class BlogCategoryAdmin(ModelAdmin):
         )
 
 @admin.register(BlogPost)
-class BlogPostAdmin(ModelAdmin, SummernoteModelAdmin):
+class BlogPostAdmin(SearchIndexMixin, ModelAdmin, SummernoteModelAdmin):
     summernote_fields = ('content',)
     list_display = ['title', 'category', 'author', 'status_badge', 'featured_badge', 'image_preview', 'published_date']
     list_filter = [
@@ -136,7 +186,8 @@ class BlogPostAdmin(ModelAdmin, SummernoteModelAdmin):
         ('published_date', RangeDateFilter),
         ('created_at', RangeDateFilter)
     ]
-    search_fields = ['title', 'content', 'author', 'seo_meta_keywords']
+    search_fields = ['title', 'author', 'seo_meta_keywords']
+    search_index_kind = search.BLOG_POST
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ['created_at', 'updated_at']
     
@@ -364,14 +415,15 @@ class ContactFormSubmissionAdmin(ModelAdmin):
         return super().changelist_view(request, extra_context=extra_context)
 
 @admin.register(Enquiry)
-class EnquiryAdmin(ModelAdmin):
+class EnquiryAdmin(SearchIndexMixin, ModelAdmin):
     list_display = ['sku_display', 'customer_name', 'email_display', 'phone_display', 'subject_preview', 'submitted_on', 'response_status', 'priority_badge']
     list_filter = [
         ResponseStatusFilter,
         SKUFilter,
         ('submitted_date', RangeDateFilter),
     ]
-    search_fields = ['sku', 'name', 'email', 'phone', 'subject', 'message']
+    search_fields = ['sku', 'name', 'email', 'phone']
+    search_index_kind = search.ENQUIRY
     readonly_fields = ['sku', 'name', 'email', 'phone', 'subject', 'message', 'ip_address', 'submitted_date']
     list_per_page = 20
     date_hierarchy = 'submitted_date'
@@ -0,0 +1,121 @@
+"""
+Product name and SKU typeahead from memory.
+
+Each worker keeps a ``PrefixIndex`` of the catalog: sorted, normalized keys
+(lower case, accents and punctuation dropped, so ``ari b`` finds
+``Ari-bact``) searched with ``bisect``, and every product's suggestion
+pre-encoded as JSON. A lookup is two binary searches and a join, with no
+database query.
+
+The index is rebuilt on the first lookup after the catalog version changes
+(see ``app/cache.py``). The version is read from the cache at most once per
+``CHECK_INTERVAL`` seconds, so edits show up within that time.
+"""
+import json
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from django.urls import reverse
+from django.utils.html import strip_tags
+
+from .cache import CATALOG, get_versions
+from .models import Product
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+CHECK_INTERVAL = 1.0
+
+# Sorts after any character a normalized key can contain.
+_END = '\U0010ffff'
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text).casefold()
+    return ''.join(char for char in text if char.isalnum())
+
+
+def _word_keys(name):
+    """Keys for the name read from each of its words but the first."""
+    words = ''.join(char if char.isalnum() else ' ' for char in name).split()
+    return {normalize(''.join(words[i:])) for i in range(1, len(words))}
+
+
+class PrefixIndex:
+    """
+    Sorted ``(key, position)`` arrays over a list of encoded suggestions.
+    Keys from the start of a name or SKU rank above keys from a later word
+    of the name, so they are kept in a separate array searched first.
+    """
+
+    def __init__(self, products):
+        self.items = []
+        primary, secondary = [], []
+        for position, product in enumerate(products):
+            name = strip_tags(product['name'])
+            self.items.append(json.dumps({
+                'id': product['id'],
+                'name': name,
+                'sku': product['sku'],
+                'url': reverse('product_in_category', args=[product['category__slug'], product['slug']]),
+            }).encode())
+            keys = {normalize(name), normalize(product['sku'])} - {''}
+            primary += [(key, position) for key in keys]
+            secondary += [(key, position) for key in _word_keys(name) - keys]
+        self.arrays = []
+        for pairs in (primary, secondary):
+            pairs.sort()
+            self.arrays.append(([key for key, _ in pairs], [position for _, position in pairs]))
+
+    def lookup(self, text, limit=DEFAULT_LIMIT):
+        """Positions of up to ``limit`` products matching ``text``."""
+        prefix = normalize(text)
+        found = []
+        if not prefix:
+            return found
+        seen = set()
+        for keys, positions in self.arrays:
+            start = bisect_left(keys, prefix)
+            end = bisect_left(keys, prefix + _END, start)
+            # Indexed rather than sliced: a short prefix can match most of
+            # the catalog, and only the first few matches are wanted.
+            for i in range(start, end):
+                position = positions[i]
+                if position not in seen:
+                    seen.add(position)
+                    found.append(position)
+                    if len(found) == limit:
+                        return found
+        return found
+
+    def suggestions(self, text, limit=DEFAULT_LIMIT):
+        """The matches for ``text`` as a JSON array."""
+        return b'[' + b', '.join(self.items[i] for i in self.lookup(text, limit)) + b']'
+
+
+def build_index():
+    products = Product.objects.values('id', 'name', 'sku', 'slug', 'category__slug').order_by('name', 'id')
+    return PrefixIndex(products)
+
+
+_lock = threading.Lock()
+_state = {'index': None, 'version': None, 'checked': 0.0}
+
+
+def get_index():
+    """This worker's index, rebuilt first if the catalog has changed."""
+    now = time.monotonic()
+    if _state['index'] is not None and now - _state['checked'] < CHECK_INTERVAL:
+        return _state['index']
+    with _lock:
+        version = get_versions([CATALOG])[0]
+        if _state['index'] is None or version != _state['version']:
+            _state['index'] = build_index()
+            _state['version'] = version
+        _state['checked'] = time.monotonic()
+        return _state['index']
+
+
+def suggestions(text, limit=DEFAULT_LIMIT):
+    return get_index().suggestions(text, limit)
@@ -0,0 +1,349 @@
+"""
+Versioned page caching.
+
+Every cached view declares the content *scopes* it is built from
+(``nav``, ``catalog``, ``blog``, ``pricelist`` or ``page:<slug>``). Each scope has a
+version number stored in the cache, and those numbers are part of the page
+cache key. Saving or deleting a model bumps the versions of the scopes it
+feeds (see ``app/signals.py``), so the next request misses and renders the
+page again while the old entries simply age out. This lets pages be cached
+for hours without admin edits going unnoticed.
+
+The same versions give every page an ETag, and the time each scope was
+last bumped its Last-Modified header, so browsers and the CDN can
+revalidate with a 304 instead of downloading the page again. Both change on
+anything that bumps a scope, deletions and related models included.
+
+Expired pages are not dropped straight away: for a grace period one request
+regenerates the page while the rest are served the stale copy.
+
+Cache keys never include cookies: the pages are the same for every visitor,
+and the only per-visitor part, the CSRF token of the enquiry form, is cached
+as a placeholder and filled in for each request when the page is served.
+Other pages are stored with precompressed gzip/brotli bodies as well.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import compression
+
+# Every public page draws the product category menu in the header, which
+# only changes with the categories and how many products each has; the
+# catalog changes with every product edit.
+NAV = 'nav'
+CATALOG = 'catalog'
+BLOG = 'blog'
+PRICE_LIST = 'pricelist'
+
+VERSION_KEY_PREFIX = 'pagecache.version.'
+# When each scope was last bumped (a Unix time), for Last-Modified.
+MODIFIED_KEY_PREFIX = 'pagecache.modified.'
+
+# Rendered in place of {% csrf_token %} values on pages stored in the cache.
+CSRF_PLACEHOLDER = 'page-cache-csrf-token-placeholder'
+
+
+PAGE_SCOPE_PREFIX = 'page:'
+
+
+def page_scope(slug):
+    """Scope for pages whose copy comes from the ``PageSEO`` row ``slug``."""
+    return PAGE_SCOPE_PREFIX + slug
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def _initial_version():
+    # Seed from the clock rather than 1 so a version key that was evicted
+    # never comes back with a number that already has pages cached under it.
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    """Return the current version of each scope, creating missing ones."""
+    cache = _cache()
+    keys = [VERSION_KEY_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), None)
+            version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+def bump_version(*scopes):
+    """Invalidate every cached page built from any of ``scopes``."""
+    cache = _cache()
+    # Recorded first, so a page with the new version never goes out with
+    # the previous Last-Modified.
+    cache.set_many({MODIFIED_KEY_PREFIX + scope: time.time() for scope in scopes}, None)
+    for scope in scopes:
+        key = VERSION_KEY_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def get_or_build(name, scopes, builder, timeout=None):
+    """
+    Return the value cached under ``name`` for the current versions of
+    ``scopes``, calling ``builder()`` to produce it on a miss.
+    """
+    cache = _cache()
+    versions = get_versions(scopes)
+    key = f'{name}.' + '.'.join(str(v) for v in versions)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        if timeout is None:
+            timeout = settings.PAGE_CACHE_TIMEOUT
+        cache.set(key, value, timeout)
+    return value
+
+
+def last_modified(scopes):
+    """When any of ``scopes`` was last bumped."""
+    cache = _cache()
+    keys = [MODIFIED_KEY_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Never bumped since the cache was filled, or evicted: changes
+            # before now can't be ruled out.
+            cache.add(key, time.time(), None)
+            found[key] = cache.get(key)
+    return datetime.fromtimestamp(max(found.values()), tz=timezone.utc)
+
+
+def etag(scopes):
+    """Weak ETag that changes whenever any of ``scopes`` is bumped."""
+    versions = '.'.join(str(v) for v in get_versions(scopes))
+    return 'W/"%s"' % hashlib.md5(versions.encode(), usedforsecurity=False).hexdigest()
+
+
+def conditional_page(scopes):
+    """
+    Add ETag/Last-Modified validators for ``scopes`` and answer matching
+    conditional GETs with a 304 before the view runs.
+    """
+    scopes = tuple(scopes)
+
+    def decorator(view_func):
+        @condition(
+            etag_func=lambda request, *args, **kwargs: etag(scopes),
+            last_modified_func=lambda request, *args, **kwargs: last_modified(scopes),
+        )
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            # Browsers only keep pages briefly and then revalidate, so edits
+            # reach them without waiting for the server-side cache timeout.
+            response.headers.pop('Expires', None)
+            response.headers.pop('Cache-Control', None)
+            if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+                # Errors and answers to POSTs are never kept by anyone.
+                patch_cache_control(response, private=True, no_store=True)
+            elif settings.EDGE_CACHE_TIMEOUT and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                # Shared caches may keep the page much longer: model saves
+                # purge it from the CDN by cache tag (see app/cdn.py). Pages
+                # holding a visitor's CSRF token are never shared.
+                patch_cache_control(
+                    response,
+                    max_age=settings.BROWSER_CACHE_TIMEOUT,
+                    s_maxage=settings.EDGE_CACHE_TIMEOUT,
+                )
+            else:
+                patch_cache_control(response, max_age=settings.BROWSER_CACHE_TIMEOUT)
+            return response
+        return _wrapped_view
+    return decorator
+
+
+class PageCacheStats:
+    """
+    Per-process counters of page cache outcomes. They are added to shared
+    totals in the cache every ``FLUSH_EVERY`` requests or ``FLUSH_INTERVAL``
+    seconds, so recording an outcome is not a cache write per request.
+    """
+
+    OUTCOMES = ('hit', 'stale', 'refresh', 'miss')
+    KEY_PREFIX = 'pagecache.stats.'
+    FLUSH_EVERY = 100
+    FLUSH_INTERVAL = 10
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def record(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+            due = (
+                self._counts.total() >= self.FLUSH_EVERY
+                or time.monotonic() - self._flushed_at >= self.FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._flushed_at = time.monotonic()
+        cache = _cache()
+        for outcome, count in counts.items():
+            key = self.KEY_PREFIX + outcome
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, None)
+
+    def totals(self):
+        self.flush()
+        cache = _cache()
+        return {
+            outcome: cache.get(self.KEY_PREFIX + outcome, 0)
+            for outcome in self.OUTCOMES
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+        _cache().delete_many([self.KEY_PREFIX + outcome for outcome in self.OUTCOMES])
+
+
+page_cache_stats = PageCacheStats()
+
+
+def _is_cacheable(request, response):
+    return (
+        request.method == 'GET'
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def _wait_for_entry(cache, key, lock_key):
+    # Another worker holds the render lock for a page nobody has cached yet;
+    # give it a moment instead of rendering the same page in parallel.
+    deadline = time.monotonic() + settings.PAGE_CACHE_MISS_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        found = cache.get_many([key, lock_key])
+        if key in found:
+            return found[key]
+        if lock_key not in found:
+            # Released without storing the page (a 404, an error...): the
+            # holder's response can't be shared, so stop waiting for it.
+            return None
+    return None
+
+
+def cached_response(request, key, timeout, render):
+    """
+    Return ``(response, variants)`` cached under ``key``, calling
+    ``render()`` to build the response for ``request`` when missing.
+    ``variants`` holds the precompressed bodies (see ``app/compression.py``).
+
+    Entries stay in the cache for ``PAGE_CACHE_GRACE`` seconds after they go
+    stale. A stale entry is regenerated by the single request that takes the
+    entry's lock (an atomic ``cache.add``, so it also holds across workers
+    sharing the cache); every other request keeps getting the stale copy
+    until the new one is stored.
+    """
+    cache = _cache()
+    lock_key = key + '.lock'
+    entry = cache.get(key)
+    if entry is not None:
+        response, fresh_until, variants = entry
+        if time.time() < fresh_until:
+            page_cache_stats.record('hit')
+            return response, variants
+        if not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            page_cache_stats.record('stale')
+            return response, variants
+        page_cache_stats.record('refresh')
+    elif cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+        page_cache_stats.record('miss')
+    else:
+        entry = _wait_for_entry(cache, key, lock_key)
+        if entry is not None:
+            page_cache_stats.record('hit')
+            return entry[0], entry[2]
+        # The lock holder is taking too long or found the page uncacheable;
+        # render without the lock.
+        page_cache_stats.record('miss')
+        lock_key = None
+
+    variants = {}
+    try:
+        request.rendering_for_page_cache = True
+        response = render()
+        if _is_cacheable(request, response):
+            # Pages with a CSRF placeholder get each visitor's token filled
+            # in, so they can't be served from precompressed bytes.
+            if CSRF_PLACEHOLDER.encode() not in response.content:
+                variants = compression.precompress(response)
+            fresh_until = time.time() + timeout
+            cache.set(key, (response, fresh_until, variants), timeout + settings.PAGE_CACHE_GRACE)
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+    return response, variants
+
+
+def insert_csrf_token(request, response):
+    """Replace the cached CSRF placeholder with this visitor's own token."""
+    placeholder = CSRF_PLACEHOLDER.encode()
+    if not response.streaming and placeholder in response.content:
+        # get_token() also makes CsrfViewMiddleware set the cookie and
+        # add Vary: Cookie, as a normal render would.
+        token = get_token(request).encode()
+        response.content = response.content.replace(placeholder, token)
+    return response
+
+
+def versioned_cache_page(timeout, scopes):
+    """
+    Cache a view's GET responses for ``timeout`` seconds, keyed by URL and
+    the versions of ``scopes`` so a bump of any of them makes it render
+    again. Expired pages are refreshed by one request at a time (see
+    ``cached_response``), and responses carry the validators from
+    ``conditional_page``.
+    """
+    scopes = tuple(scopes)
+
+    def decorator(view_func):
+        @conditional_page(scopes)
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            versions = '.'.join(str(v) for v in get_versions(scopes))
+            url = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False)
+            key = f'pagecache.page.{versions}.{url.hexdigest()}'
+            response, variants = cached_response(
+                request, key, timeout, lambda: view_func(request, *args, **kwargs)
+            )
+            return compression.apply(request, insert_csrf_token(request, response), variants)
+        return _wrapped_view
+    return decorator
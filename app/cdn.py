@@ -0,0 +1,172 @@
+"""
+Edge (CDN) caching of public pages.
+
+Responses carry a ``Cache-Tag`` header listing what they were rendered from
+(``nav`` for the category menu, ``catalog``, ``product:<id>``,
+``category:<slug>``, ``blog``, ``pricelist``, ``page:<slug>``) and an
+``s-maxage`` so the CDN can keep them for hours. When a model changes, the
+signal handlers queue the matching tags and, once the database transaction
+has committed, a background thread sends them to the CDN with the configured
+purger, retrying failures (``CDN_PURGE_RETRIES``) so a slow or failing CDN
+API neither holds up the admin request nor loses the purge.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+NAV = 'nav'
+CATALOG = 'catalog'
+BLOG = 'blog'
+PRICE_LIST = 'pricelist'
+
+
+def product_tag(product_id):
+    return f'product:{product_id}'
+
+
+def category_tag(slug):
+    return f'category:{slug}'
+
+
+def page_tag(slug):
+    return f'page:{slug}'
+
+
+def add_cache_tags(response, *tags):
+    """Add ``tags`` to the response's cache tag header."""
+    header = settings.CDN_CACHE_TAG_HEADER
+    existing = [tag for tag in response.get(header, '').split(',') if tag]
+    for tag in tags:
+        if tag not in existing:
+            existing.append(tag)
+    response[header] = ','.join(existing)
+    return response
+
+
+def cache_tags(*tags):
+    """View decorator adding fixed cache tags to every response."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            return add_cache_tags(view_func(request, *args, **kwargs), *tags)
+        return _wrapped_view
+    return decorator
+
+
+# --- purgers ---
+
+class BasePurger:
+    """Sends purge requests for cache tags to a CDN."""
+
+    # Most CDN APIs limit how many tags one request may carry.
+    batch_size = 30
+
+    def __init__(self, **options):
+        self.options = options
+
+    def purge(self, tags):
+        raise NotImplementedError
+
+
+class LogPurger(BasePurger):
+    """Only logs the tags; the default when no CDN is configured."""
+
+    def purge(self, tags):
+        logger.info('CDN purge: %s', ', '.join(tags))
+
+
+class FilePurger(BasePurger):
+    """Appends each purge as a JSON line to ``PATH``, for local setups and tests."""
+
+    def purge(self, tags):
+        path = Path(self.options['PATH'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('a') as f:
+            f.write(json.dumps({'tags': list(tags)}) + '\n')
+
+
+class CloudflarePurger(BasePurger):
+    """Purges by cache tag through the Cloudflare API (``ZONE_ID``, ``API_TOKEN``)."""
+
+    def purge(self, tags):
+        response = requests.post(
+            f"https://api.cloudflare.com/client/v4/zones/{self.options['ZONE_ID']}/purge_cache",
+            headers={'Authorization': f"Bearer {self.options['API_TOKEN']}"},
+            json={'tags': list(tags)},
+            timeout=10,
+        )
+        response.raise_for_status()
+
+
+_purger = None
+
+
+def get_purger():
+    global _purger
+    if _purger is None:
+        config = settings.CDN_PURGER
+        _purger = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _purger
+
+
+# --- purge queue ---
+
+_pending = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # One thread, so purges go out in the order they were queued.
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cdn-purge')
+        return _executor
+
+
+def _purge(tags):
+    purger = get_purger()
+    for start in range(0, len(tags), purger.batch_size):
+        batch = tags[start:start + purger.batch_size]
+        for attempt in range(settings.CDN_PURGE_RETRIES + 1):
+            try:
+                purger.purge(batch)
+                break
+            except Exception:
+                if attempt == settings.CDN_PURGE_RETRIES:
+                    # Given up; the pages still expire at the edge after
+                    # EDGE_CACHE_TIMEOUT.
+                    logger.exception('CDN purge failed for %s', ', '.join(batch))
+                else:
+                    logger.warning('CDN purge failed for %s, retrying', ', '.join(batch), exc_info=True)
+                    time.sleep(settings.CDN_PURGE_RETRY_DELAY * 2 ** attempt)
+
+
+def _flush():
+    tags = sorted(getattr(_pending, 'tags', None) or ())
+    _pending.tags = set()
+    if tags:
+        _get_executor().submit(_purge, tags)
+
+
+def queue_purge(*tags):
+    """
+    Purge ``tags`` from the CDN after the current transaction commits. Tags
+    queued during one transaction go out together with the first flush.
+    """
+    if getattr(_pending, 'tags', None) is None:
+        _pending.tags = set()
+    _pending.tags.update(tags)
+    transaction.on_commit(_flush)
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if getattr(settings, 'SHARED_CACHE', True):
+        return []
+    return [
+        checks.Warning(
+            'SHARED_CACHE is off, so each process has its own page cache.',
+            hint=(
+                'Saves only invalidate the cached pages of the process that '
+                'handled them; other Gunicorn workers serve stale pages for up '
+                'to PAGE_CACHE_TIMEOUT seconds. Use it with a single process only.'
+            ),
+            id='app.W001',
+        )
+    ]
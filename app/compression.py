@@ -0,0 +1,130 @@
+"""
+Precompressed variants of cached pages.
+
+When the page cache stores a response it also stores its body compressed
+with gzip and, when the brotli package is installed, brotli. A cache hit is
+then answered with the encoding the client prefers, compressed once when
+the page was rendered instead of on every request.
+
+Other text responses, including pages holding a visitor's CSRF token, are
+gzipped per request by ``TextGZipMiddleware``: Django's GZipMiddleware,
+which also pads its output against BREACH-style attacks on secrets in
+compressed pages, limited to ``COMPRESSIBLE_TYPES``. Images and files are
+sent as they are.
+"""
+import gzip
+
+from django.http import FileResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+MIN_SIZE = 200
+# Brotli's maximum quality (11) takes ~10x longer for a few percent less;
+# variants are built on the request that renders the page, so keep it fast.
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+def _gzip(data):
+    # mtime=0 keeps the output identical across renders of the same page.
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+# In order of preference.
+ENCODERS = [('gzip', _gzip)]
+if brotli is not None:
+    ENCODERS.insert(0, ('br', _brotli))
+
+
+def precompress(response):
+    """Return ``{encoding: body}`` for the encodings worth storing for ``response``."""
+    if (
+        response.streaming
+        or response.has_header('Content-Encoding')
+        or len(response.content) < MIN_SIZE
+        or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+    ):
+        return {}
+    variants = {}
+    for encoding, compress in ENCODERS:
+        body = compress(response.content)
+        if len(body) < len(response.content):
+            variants[encoding] = body
+    return variants
+
+
+def accepted_encodings(request):
+    """Map of content codings in the request's Accept-Encoding to their q-value."""
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(request, variants):
+    accepted = accepted_encodings(request)
+    for encoding, _ in ENCODERS:
+        if encoding in variants and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def apply(request, response, variants):
+    """Answer with the variant of ``response`` the client accepts, if any."""
+    if not variants:
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = choose_encoding(request, variants)
+    if encoding:
+        response.content = variants[encoding]
+        response['Content-Encoding'] = encoding
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+    return response
+
+
+class TextGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware for text responses only. Images are compressed already,
+    and files (``FileResponse``) keep their Content-Length instead of being
+    turned into a compressed stream. Responses answered from precompressed
+    variants carry Content-Encoding and are skipped by GZipMiddleware.
+    """
+
+    def process_response(self, request, response):
+        if (
+            isinstance(response, FileResponse)
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+        return super().process_response(request, response)
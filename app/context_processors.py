@@ -0,0 +1,45 @@
+from django.db.models import Count
+from django.utils.functional import SimpleLazyObject
+
+from .cache import CSRF_PLACEHOLDER, NAV, get_or_build
+from .models import ProductCategory, excerpt
+
+NAV_DESCRIPTION_LENGTH = 200
+
+
+def _build_navigation():
+    categories = ProductCategory.objects.annotate(
+        product_count=Count('products')
+    ).values('id', 'name', 'slug', 'icon', 'description_text', 'product_count')
+    snapshot = []
+    for category in categories:
+        # The home page's PageSEO content shows a line-clamped description;
+        # short plain text does for that, the full HTML is only dead weight.
+        category['description'] = excerpt(category.pop('description_text'), NAV_DESCRIPTION_LENGTH)
+        # PageSEO content written against the old queryset still uses
+        # ``category.products.count``; keep that lookup working.
+        category['products'] = {'count': category['product_count']}
+        snapshot.append(category)
+    return snapshot
+
+
+def get_navigation():
+    """
+    Product categories for the site menus as plain dicts, with a
+    ``product_count`` instead of the related products themselves.
+    """
+    return get_or_build('navigation', [NAV], _build_navigation)
+
+
+def navigation(request):
+    # Lazy so pages that never draw the menu (e.g. the admin) skip the lookup.
+    return {'product_categories': SimpleLazyObject(get_navigation)}
+
+
+def page_cache_csrf(request):
+    # Pages rendered for the shared page cache must not contain the token of
+    # whoever happened to trigger the render; the cache fills in each
+    # visitor's own token when it serves the page.
+    if getattr(request, 'rendering_for_page_cache', False):
+        return {'csrf_token': CSRF_PLACEHOLDER}
+    return {}
@@ -0,0 +1,222 @@
+"""
+Image processing off the request.
+
+Saving a new product image or blog featured image stores the upload as it
+is in ``images.upload_storage()``, which is never served, records its name
+in ``<field>_upload`` and marks it ``pending``, so the admin request returns
+straight away. The image field keeps the previous image, if any.
+The re-encoded image (cropped for products) and the derivatives (see
+``app/images.py``) are then made by ``process()``, started after the transaction commits as configured by
+``IMAGE_PROCESSING``:
+
+- ``thread``: in a small thread pool inside the web worker;
+- ``worker``: by ``python manage.py process_images``, which polls for
+  pending images;
+- ``sync``: straight away, in the process that saved the row.
+
+Whoever runs it first claims the image by moving it from ``pending`` to
+``processing`` in one UPDATE, so an image is never processed twice. Until
+it is ``ready`` pages show the previous image, or none; an upload that
+fails to process stays where it is, for "Process images again". Images
+left pending by a restarted web worker are picked up by
+``process_images``, as are those still ``processing`` after
+``IMAGE_PROCESSING_TIMEOUT`` (see ``requeue_stale()``); in ``thread`` mode
+every job first checks for the latter too.
+
+The result is written with an UPDATE of the image columns only, so edits
+made to the row while the image was being processed are kept.
+"""
+import datetime
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from . import image_resize, images
+from .models import BlogPost, IMAGE_FAILED, IMAGE_PENDING, IMAGE_PROCESSING, IMAGE_READY, Product
+
+logger = logging.getLogger(__name__)
+
+# Model -> (image field, whether the image is cropped to a square). Each
+# field has ``<field>_derivatives``, ``<field>_status``, ``<field>_error``,
+# ``<field>_claimed_at`` and ``<field>_upload`` next to it.
+IMAGE_FIELDS = {
+    Product: ('image', True),
+    BlogPost: ('featured_image', False),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _fields(model):
+    field, square = IMAGE_FIELDS[model]
+    return field, f'{field}_derivatives', f'{field}_status', f'{field}_error', square
+
+
+def is_pending(instance):
+    _, _, status_field, _, _ = _fields(type(instance))
+    return getattr(instance, status_field) == IMAGE_PENDING
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_THREADS, thread_name_prefix='images'
+            )
+        return _executor
+
+
+def _process_in_thread(model, pk):
+    try:
+        # process_images only runs at start-up in this mode, so each job
+        # also looks for images claimed by a worker that died since.
+        requeued = requeue_stale()
+        process(model, pk)
+        if requeued:
+            process_pending()
+    except Exception:
+        logger.exception('Image processing failed for %s %s', model.__name__, pk)
+    finally:
+        # Connections are per thread; don't leave this one open.
+        connections.close_all()
+
+
+def schedule(instance):
+    """Process the pending image of ``instance`` once the current transaction commits."""
+    model, pk = type(instance), instance.pk
+    if settings.IMAGE_PROCESSING == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(_process_in_thread, model, pk))
+    elif settings.IMAGE_PROCESSING == 'sync':
+        transaction.on_commit(lambda: process(model, pk))
+    # 'worker': left for manage.py process_images.
+
+
+def process(model, pk):
+    """
+    Process the pending image of row ``pk`` of ``model``. Returns False if
+    it wasn't pending (already done, or claimed by someone else).
+    """
+    field, derivatives_field, status_field, error_field, square = _fields(model)
+    upload_field = f'{field}_upload'
+    claimed = model.objects.filter(pk=pk, **{status_field: IMAGE_PENDING}).update(
+        **{status_field: IMAGE_PROCESSING, f'{field}_claimed_at': timezone.now()}
+    )
+    if not claimed:
+        return False
+
+    instance = model.objects.get(pk=pk)
+    field_file = getattr(instance, field)
+    storage = field_file.storage
+    current, upload = field_file.name, getattr(instance, upload_field)
+    if upload:
+        source_storage, source = images.upload_storage(), upload
+        target = field_file.field.generate_filename(instance, os.path.basename(upload))
+    else:
+        # Processing the current image again.
+        source_storage, source = storage, current
+        target = current
+    # Only while the image still is what was loaded here.
+    unchanged = model.objects.filter(pk=pk, **{field: current, upload_field: upload})
+    name = None
+    try:
+        with source_storage.open(source, 'rb') as f:
+            data, extension = images.process_upload(f, square)
+        name = storage.save(os.path.splitext(target)[0] + extension, ContentFile(data))
+        record = images.make_derivatives(BytesIO(data), name, storage)
+    except Exception as e:
+        logger.exception('Processing %s failed', source)
+        if name:
+            storage.delete(name)
+        # A failed upload stays out of the public media, ready to be retried.
+        unchanged.update(**{status_field: IMAGE_FAILED, error_field: str(e)})
+        return True
+
+    # Only the image columns: ``instance`` was loaded before the slow part,
+    # and saving it would undo edits made to the row since.
+    updated = unchanged.update(**{
+        field: name,
+        upload_field: '',
+        derivatives_field: record,
+        status_field: IMAGE_READY,
+        error_field: '',
+        'updated_at': timezone.now(),
+    })
+    if not updated:
+        # Replaced by another upload meanwhile; that one has its own job.
+        images.delete_derivatives(record, storage)
+        storage.delete(name)
+        return True
+
+    # Let the API JSON, search index and caches follow, as on a save.
+    fresh = model.objects.get(pk=pk)
+    post_save.send(
+        sender=model, instance=fresh, created=False, raw=False, using=fresh._state.db,
+        update_fields={field, upload_field, derivatives_field, status_field, error_field, 'updated_at'},
+    )
+
+    images.delete_derivatives(getattr(instance, derivatives_field), storage)
+    source_storage.delete(source)
+    if not upload:
+        image_resize.discard(source)
+    return True
+
+
+def process_pending(model=None):
+    """Process every pending image (of ``model``, or of all). Returns how many were processed."""
+    count = 0
+    for image_model in ([model] if model else IMAGE_FIELDS):
+        _, _, status_field, _, _ = _fields(image_model)
+        pending = image_model.objects.filter(**{status_field: IMAGE_PENDING}).order_by('pk')
+        for pk in pending.values_list('pk', flat=True):
+            count += process(image_model, pk)
+    return count
+
+
+def requeue_stale():
+    """
+    Mark pending again the images claimed more than
+    ``IMAGE_PROCESSING_TIMEOUT`` seconds ago and still processing, whose
+    worker must have died. Returns how many.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.IMAGE_PROCESSING_TIMEOUT)
+    count = 0
+    for model in IMAGE_FIELDS:
+        field, _, status_field, error_field, _ = _fields(model)
+        claimed_at = f'{field}_claimed_at'
+        # One UPDATE, so an image finished meanwhile stays ready.
+        count += model.objects.filter(
+            Q(**{f'{claimed_at}__lt': cutoff}) | Q(**{f'{claimed_at}__isnull': True}),
+            **{status_field: IMAGE_PROCESSING},
+        ).update(**{status_field: IMAGE_PENDING, error_field: ''})
+    return count
+
+
+def requeue(queryset, statuses=None):
+    """
+    Mark the images of ``queryset`` (limited to those in ``statuses``, if
+    given) for processing again and schedule them. Returns how many.
+    """
+    model = queryset.model
+    field, _, status_field, error_field, _ = _fields(model)
+    has_image = ~Q(**{field: ''}) & Q(**{f'{field}__isnull': False})
+    queryset = queryset.filter(has_image | ~Q(**{f'{field}_upload': ''}))
+    if statuses:
+        queryset = queryset.filter(**{f'{status_field}__in': statuses})
+    instances = list(queryset)
+    model.objects.filter(pk__in=[instance.pk for instance in instances]).update(
+        **{status_field: IMAGE_PENDING, error_field: ''}
+    )
+    for instance in instances:
+        schedule(instance)
+    return len(instances)
@@ -0,0 +1,259 @@
+"""
+On-demand resized images.
+
+``/img/<width>x<height>/<path>`` serves the image stored as ``<path>`` in
+the default storage (the local media folder or R2), scaled down to fit in
+``width`` x ``height`` without upscaling. The format follows the request's
+``Accept`` header: AVIF, then WebP (each if listed in
+``IMAGE_DERIVATIVE_FORMATS`` and writable by this Pillow build), else JPEG,
+or PNG for images with transparency.
+
+Only the sizes in ``IMAGE_RESIZE_SIZES`` are served, so the cache can't be
+filled with arbitrary sizes. Results are kept on disk under
+``IMAGE_RESIZE_CACHE_DIR``, shared by the workers of a node, keyed by the
+path and the stored image's modification time, so a path reused for a new
+image (once image processing deleted the original upload) doesn't get the
+old image's sizes. The modification time is looked up at most once per
+``SOURCE_CHECK_INTERVAL``, and ``discard()`` forgets it at once. The cache is
+trimmed to ``IMAGE_RESIZE_CACHE_MAX_SIZE`` by dropping the least recently
+used files; a hit refreshes its file's mtime at most once per
+``TOUCH_INTERVAL``.
+
+Responses may be cached for ``IMAGE_RESIZE_MAX_AGE`` seconds and then
+revalidated: a path can be reused for a new image once the one it held was
+deleted, so they carry an ``ETag`` made from the cached file's path, which
+includes the stored image's modification time.
+
+Images that can't be decoded (missing, corrupt, or too large) are 404s.
+
+Hits and misses are counted like the page cache's (see
+``python manage.py image_cache_stats``).
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from . import images
+from .cache import PageCacheStats
+
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.avif', '.gif')
+
+# Pillow save() options for the formats every browser takes.
+FALLBACK_FORMATS = {
+    'jpeg': {'format': 'JPEG', 'quality': images.JPEG_QUALITY, 'optimize': True},
+    'png': {'format': 'PNG', 'optimize': True},
+}
+CONTENT_TYPES = {**images.MIME_TYPES, 'jpeg': 'image/jpeg', 'png': 'image/png'}
+
+TOUCH_INTERVAL = 60 * 60
+SOURCE_CHECK_INTERVAL = 5 * 60
+SOURCE_KEY_PREFIX = 'imagecache.source.'
+# Check the cache size after this many bytes were added or this many
+# seconds, whichever comes first, and trim it to LOW_WATER of the maximum.
+PRUNE_EVERY_BYTES = 16 * 1024 * 1024
+PRUNE_INTERVAL = 5 * 60
+LOW_WATER = 0.9
+
+
+class ImageCacheStats(PageCacheStats):
+    OUTCOMES = ('hit', 'miss')
+    KEY_PREFIX = 'imagecache.stats.'
+
+
+image_cache_stats = ImageCacheStats()
+
+
+class ImageNotFound(Exception):
+    pass
+
+
+def allowed_sizes():
+    """``IMAGE_RESIZE_SIZES`` as a set of ``(width, height)``."""
+    sizes = set()
+    for size in settings.IMAGE_RESIZE_SIZES:
+        width, _, height = size.partition('x')
+        sizes.add((int(width), int(height)))
+    return sizes
+
+
+def negotiate(accept, has_alpha=False):
+    """The format to send a client whose ``Accept`` header is ``accept``."""
+    accepted = set()
+    for part in accept.split(','):
+        media_type, *params = [item.strip() for item in part.split(';')]
+        if 'q=0' in params or 'q=0.0' in params:
+            continue
+        accepted.add(media_type.lower())
+    for fmt in ('avif', 'webp'):
+        if CONTENT_TYPES[fmt] in accepted and fmt in images.derivative_formats():
+            return fmt
+    return 'png' if has_alpha else 'jpeg'
+
+
+def _digest(name):
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+def _source_dir(name):
+    digest = _digest(name)
+    return os.path.join(settings.IMAGE_RESIZE_CACHE_DIR, digest[:2], digest)
+
+
+def _source_version(name):
+    """The modification time of the stored image ``name``, as a string."""
+    cache = caches[settings.PAGE_CACHE_ALIAS]
+    key = SOURCE_KEY_PREFIX + _digest(name)
+    version = cache.get(key)
+    if version is None:
+        if not default_storage.exists(name):
+            raise ImageNotFound(name)
+        version = str(int(default_storage.get_modified_time(name).timestamp()))
+        cache.set(key, version, SOURCE_CHECK_INTERVAL)
+    return version
+
+
+def _render(name, width, height, accept):
+    """Resize ``name`` and return ``(format, bytes)``."""
+    # Covering the box either way round, in case of EXIF rotation.
+    side = max(width, height)
+    try:
+        with images.decode_slots:
+            with default_storage.open(name, 'rb') as f:
+                img = images.reduce(images.open_image(f, (side, side)), (side, side))
+            images.fit(img, (width, height))
+            img = images.finish(img)
+    except (OSError, Image.DecompressionBombError, images.ImageTooLarge):
+        # Missing, corrupt or truncated (UnidentifiedImageError is an
+        # OSError too), or too large to decode.
+        raise ImageNotFound(name)
+    fmt = negotiate(accept, images.has_alpha(img))
+    if fmt == 'jpeg' and img.mode == 'RGBA':
+        img = img.convert('RGB')
+    buffer = BytesIO()
+    img.save(buffer, **(images.FORMATS.get(fmt) or FALLBACK_FORMATS[fmt]))
+    return fmt, buffer.getvalue()
+
+
+def _store(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _lookup(directory, width, height, accept):
+    """The cached file for the format ``accept`` negotiates, or None."""
+    # Which formats there are tells whether the image has transparency.
+    has_alpha = os.path.exists(os.path.join(directory, f'{width}x{height}.png'))
+    path = os.path.join(directory, f'{width}x{height}.{negotiate(accept, has_alpha)}')
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+    if time.time() - mtime > TOUCH_INTERVAL:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+    return path
+
+
+def get(name, width, height, accept):
+    """
+    The resized image as ``(path, content type)``, from the disk cache or
+    made now. Raises ``ImageNotFound``.
+    """
+    directory = os.path.join(_source_dir(name), _source_version(name))
+    path = _lookup(directory, width, height, accept)
+    if path is not None:
+        image_cache_stats.record('hit')
+    else:
+        image_cache_stats.record('miss')
+        fmt, data = _render(name, width, height, accept)
+        path = os.path.join(directory, f'{width}x{height}.{fmt}')
+        _store(path, data)
+        _pruner.added(len(data))
+    return path, CONTENT_TYPES[os.path.splitext(path)[1][1:]]
+
+
+def etag(path):
+    """ETag for the cached file ``path`` returned by ``get()``."""
+    return '"%s"' % _digest(os.path.relpath(path, settings.IMAGE_RESIZE_CACHE_DIR))[:32]
+
+
+def discard(name):
+    """Drop the cached sizes of ``name``, before its path is reused."""
+    caches[settings.PAGE_CACHE_ALIAS].delete(SOURCE_KEY_PREFIX + _digest(name))
+    shutil.rmtree(_source_dir(name), ignore_errors=True)
+
+
+def cache_files():
+    """``(mtime, size, path)`` of every file in the cache."""
+    files = []
+    for root, _, filenames in os.walk(settings.IMAGE_RESIZE_CACHE_DIR):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    return files
+
+
+def prune(max_size=None):
+    """Delete least recently used files until the cache is within bounds. Returns the bytes left."""
+    max_size = settings.IMAGE_RESIZE_CACHE_MAX_SIZE if max_size is None else max_size
+    files = cache_files()
+    total = sum(size for _, size, _ in files)
+    if total <= max_size:
+        return total
+    files.sort()
+    for _, size, path in files:
+        if total <= max_size * LOW_WATER:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+class _Pruner:
+    """Runs ``prune()`` now and then as a worker adds files."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._added = 0
+        self._pruned_at = time.monotonic()
+
+    def added(self, size):
+        with self._lock:
+            self._added += size
+            due = (
+                self._added >= PRUNE_EVERY_BYTES
+                or time.monotonic() - self._pruned_at >= PRUNE_INTERVAL
+            )
+            if due:
+                self._added = 0
+                self._pruned_at = time.monotonic()
+        if due:
+            prune()
+
+
+_pruner = _Pruner()
@@ -0,0 +1,241 @@
+"""
+Processing of uploaded product and blog images.
+
+Uploads are re-encoded, product images cropped to a centred square first,
+so that what is stored is at most ``IMAGE_MAX_DIMENSION`` px a side, the
+right way up and without EXIF or XMP metadata (camera details, GPS). This
+only happens for a newly uploaded file: ``Product.save()`` checks with
+``is_new_upload()`` and compares ``content_hash()`` of the upload with the
+hash stored for the current image, so saving a product for any other
+reason neither downloads, re-encodes nor re-uploads its image. Until it is
+processed, a new upload waits in ``upload_storage()``, outside the public
+media (see ``app/image_jobs.py``).
+
+New product images and blog featured images also get *derivatives*: copies
+resized to each of ``IMAGE_DERIVATIVE_WIDTHS`` in each of
+``IMAGE_DERIVATIVE_FORMATS``, stored under ``derivatives/``. They are
+recorded on the model in a JSON field::
+
+    {"source": "products/a.jpg", "width": 1200, "height": 1200,
+     "formats": {"avif": [[320, "derivatives/products/a-320w.avif"], ...],
+                 "webp": [...]}}
+
+and drawn by the ``{% responsive_image %}`` tag. ``source`` ties the record
+to the file it was made from, so a record left behind by another image is
+never used. ``python manage.py build_image_derivatives`` makes them for
+existing images.
+
+Decoding is kept to what the output needs, so a large phone photo doesn't
+spike a worker's memory: JPEGs are decoded at a reduced scale (Pillow's
+``draft()``, 1/2 to 1/8 of the full size) when the output is small enough,
+other formats are ``reduce()``d straight after decoding, and cropping,
+rotating and converting happen on the smaller image. Images of more than
+``IMAGE_MAX_PIXELS`` pixels are refused before anything is decoded, and a
+process decodes at most ``IMAGE_DECODE_CONCURRENCY`` images at a time.
+``scripts/bench_image_memory.py`` measures the peak memory.
+"""
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import ExifTags, Image, ImageOps, features
+
+JPEG_QUALITY = 85
+# Resize in two steps, a fast integer reduce() then LANCZOS for the last
+# factor of this much; quality is indistinguishable from LANCZOS alone.
+REDUCING_GAP = 3.0
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+# Pillow save() options per derivative format.
+FORMATS = {
+    'avif': {'format': 'AVIF', 'quality': 60},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+def is_new_upload(field_file):
+    """Whether ``field_file`` holds a file assigned since the model was loaded."""
+    return bool(field_file) and not field_file._committed
+
+
+def content_hash(field_file):
+    """SHA-256 of the contents of an uploaded ``field_file``."""
+    digest = hashlib.sha256()
+    for chunk in field_file.chunks():
+        digest.update(chunk)
+    field_file.seek(0)
+    return digest.hexdigest()
+
+
+def upload_storage():
+    """Where new uploads wait to be processed: ``IMAGE_UPLOAD_DIR``, never served."""
+    return FileSystemStorage(location=settings.IMAGE_UPLOAD_DIR, base_url=None)
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+# Full-size images decoded at once by this process (the image job threads
+# and /img/ requests), so their memory doesn't add up.
+decode_slots = threading.BoundedSemaphore(settings.IMAGE_DECODE_CONCURRENCY)
+
+
+def has_alpha(img):
+    return 'A' in img.getbands() or 'transparency' in img.info
+
+
+def _quarter_turned(img):
+    return img.getexif().get(ExifTags.Base.Orientation, 1) > 4
+
+
+def open_image(file, size=None):
+    """
+    Open the image in ``file`` without decoding it yet. With ``size``, a
+    JPEG will be decoded at the smallest scale still covering ``size``.
+    Raises ``ImageTooLarge`` past ``IMAGE_MAX_PIXELS``.
+    """
+    img = Image.open(file)
+    if img.width * img.height > settings.IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(
+            f'{img.width}x{img.height} is more than {settings.IMAGE_MAX_PIXELS:,} pixels'
+        )
+    if size:
+        img.draft(None, size)
+    return img
+
+
+def reduce(img, size):
+    """
+    Decode ``img``, shrunk by the largest whole factor that still covers
+    ``size``. Formats ``draft()`` can't scale are reduced straight after
+    decoding, before any other full-size copy is made.
+    """
+    img.load()
+    factor = min(img.width // size[0], img.height // size[1])
+    if factor > 1:
+        img = img.reduce(factor)
+    return img
+
+
+def fit(img, size):
+    """Scale ``img`` down, in place, to fit ``size`` once turned as its EXIF orientation says."""
+    if _quarter_turned(img):
+        size = size[::-1]
+    img.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+
+def finish(img):
+    """
+    ``img`` the right way up, without metadata, in RGB or RGBA. Each step
+    may copy the image, so this comes after it is scaled down.
+    """
+    ImageOps.exif_transpose(img, in_place=True)
+    for key in METADATA_KEYS:
+        img.info.pop(key, None)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if has_alpha(img) else 'RGB')
+    return img
+
+
+def validate_pixels(field_file):
+    """Model field validator: refuse new uploads past ``IMAGE_MAX_PIXELS``."""
+    if not is_new_upload(field_file):
+        return
+    try:
+        open_image(field_file)
+    except ImageTooLarge as e:
+        raise ValidationError(f'This image is too large ({e}).')
+    except OSError:
+        pass  # Not an image: the form field says so.
+    finally:
+        field_file.seek(0)
+
+
+def process_upload(file, square=False):
+    """
+    The image in ``file`` (cropped to a centred square with ``square``)
+    scaled down to ``IMAGE_MAX_DIMENSION``, as ``(bytes, extension)``: JPEG,
+    or PNG if it has transparency.
+    """
+    box = (settings.IMAGE_MAX_DIMENSION, settings.IMAGE_MAX_DIMENSION)
+    with decode_slots:
+        img = reduce(open_image(file, box), box)
+        if square:
+            # The centre square is the same whichever way up the image is.
+            min_dim = min(img.size)
+            left = (img.width - min_dim) // 2
+            top = (img.height - min_dim) // 2
+            img = img.crop((left, top, left + min_dim, top + min_dim))
+        fit(img, box)
+        img = finish(img)
+
+    buffer = BytesIO()
+    if has_alpha(img):
+        img.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue(), '.png'
+    img.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    return buffer.getvalue(), '.jpg'
+
+
+def derivative_formats():
+    """The configured derivative formats this Pillow build can write."""
+    return [fmt for fmt in settings.IMAGE_DERIVATIVE_FORMATS if fmt in FORMATS and features.check(fmt)]
+
+
+def make_derivatives(file, name, storage):
+    """
+    Store the derivatives of the image in ``file``, which is saved in
+    ``storage`` as ``name``, and return their record.
+    """
+    largest = max(settings.IMAGE_DERIVATIVE_WIDTHS)
+    box = (largest, largest)
+    with decode_slots:
+        img = open_image(file)
+        size = img.size[::-1] if _quarter_turned(img) else img.size
+        img.draft(None, box)
+        img = reduce(img, box)
+        fit(img, (largest, size[1]))
+        img = finish(img)
+    record = {'source': name, 'width': size[0], 'height': size[1], 'formats': {}}
+    root = 'derivatives/' + os.path.splitext(name)[0]
+    # Never upscale: widths past the original collapse into the original's.
+    widths = sorted({min(width, record['width']) for width in settings.IMAGE_DERIVATIVE_WIDTHS})
+    for width in widths:
+        resized = img
+        if width != img.width:
+            resized = img.resize(
+                (width, max(1, round(img.height * width / img.width))),
+                Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP,
+            )
+        for fmt in derivative_formats():
+            buffer = BytesIO()
+            resized.save(buffer, **FORMATS[fmt])
+            stored = storage.save(f'{root}-{width}w.{fmt}', ContentFile(buffer.getvalue()))
+            record['formats'].setdefault(fmt, []).append([width, stored])
+    return record
+
+
+def delete_derivatives(record, storage):
+    for entries in (record or {}).get('formats', {}).values():
+        for _, name in entries:
+            storage.delete(name)
+
+
+def replace_derivatives(file, field_file, old_record):
+    """Derivatives for the image in ``file``, just stored as ``field_file``, replacing ``old_record``'s."""
+    delete_derivatives(old_record, field_file.storage)
+    return make_derivatives(file, field_file.name, field_file.storage)
+
+
+def current_derivatives(field_file, record):
+    """``record`` if it was made from the file ``field_file`` holds now, else None."""
+    if field_file and record and record.get('source') == field_file.name:
+        return record
+    return None
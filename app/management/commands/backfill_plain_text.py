@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app import cdn, search, snapshots
+from app.cache import BLOG, CATALOG, bump_version
+from app.models import BlogPost, Product, ProductCategory
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the plain-text, excerpt and first-sentence fields derived "
+        "from the Summernote HTML of products, product categories and blog "
+        "posts, then the stored API JSON and search index built from them, and "
+        "drop the cached pages showing them. save() keeps them up to date; run "
+        "this after bulk imports or raw SQL changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows loaded and written per query (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        for model in (ProductCategory, Product, BlogPost):
+            # bulk_update() sends no signals, so the API JSON (which carries
+            # the product excerpt) is rebuilt alongside. Nor does it set
+            # updated_at, which incremental exports and the APIs' ?since= go by.
+            derived = model.plain_text_fields + ["api_json"]
+            fields = derived + ["updated_at"]
+            queryset = model.objects.order_by("pk")
+            if model is not ProductCategory:
+                queryset = queryset.select_related("category")
+            batch = []
+            count = 0
+            for instance in queryset.iterator(chunk_size=batch_size):
+                before = [getattr(instance, field) for field in derived]
+                instance.update_plain_text()
+                instance.api_json = snapshots.build(instance)
+                if [getattr(instance, field) for field in derived] == before:
+                    continue
+                instance.updated_at = now
+                batch.append(instance)
+                if len(batch) == batch_size:
+                    model.objects.bulk_update(batch, fields)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, fields)
+                count += len(batch)
+            snapshots.refresh_lists(model)
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {count} updated")
+        # The search index is built from these fields.
+        search.rebuild()
+        # As are the excerpts and descriptions on cached pages.
+        bump_version(CATALOG, BLOG)
+        cdn.queue_purge(cdn.CATALOG, cdn.BLOG)
+        self.stdout.write(self.style.SUCCESS("Plain-text fields are up to date."))
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max
+from django.test import Client, override_settings
+from django.urls import resolve
+from whitenoise.compress import Compressor
+
+from app.context_processors import get_navigation
+from app.models import (
+    ProductCategory, Product, ProductStatus, BlogPost, BlogCategory, PriceList, PageSEO
+)
+from app.public_urls import public_urls
+
+MANIFEST_NAME = ".export-manifest.json"
+EXPORT_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "export_site"},
+}
+
+# PageSEO slug each static page takes its copy from.
+PAGE_SLUGS = {
+    "home": "home",
+    "about": "about",
+    "contact": "contact",
+    "enquiry": "enquiry",
+    "products": "products",
+    "blog": "blog",
+    "price_list": "price-list",
+}
+
+
+def _stamp(queryset, field="updated_at"):
+    """Newest timestamp plus row count, so deletions change the stamp too."""
+    result = queryset.aggregate(latest=Max(field), count=Count("pk"))
+    latest = result["latest"].isoformat() if result["latest"] else ""
+    return f"{latest}/{result['count']}"
+
+
+class Fingerprints:
+    """
+    Work out, from ``updated_at`` columns, a fingerprint of everything a
+    public URL is rendered from. A URL whose fingerprint matches the last
+    export does not need to be rendered again.
+    """
+
+    def __init__(self):
+        self._memo = {}
+        self.templates = self._digest_templates()
+
+    def _once(self, name, build):
+        if name not in self._memo:
+            self._memo[name] = build()
+        return self._memo[name]
+
+    @staticmethod
+    def _digest_templates():
+        # A deploy that changes templates has to re-render everything.
+        digest = hashlib.sha256()
+        for root in (Path(settings.BASE_DIR) / "app" / "templates", Path(settings.BASE_DIR) / "theme" / "templates"):
+            for path in sorted(root.rglob("*.html")):
+                digest.update(path.relative_to(root).as_posix().encode())
+                digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def navigation(self):
+        return self._once("navigation", lambda: repr(get_navigation()))
+
+    def catalog(self):
+        return self._once("catalog", lambda: "|".join([
+            _stamp(ProductCategory.objects.all()),
+            _stamp(Product.objects.all()),
+            self.statuses(),
+        ]))
+
+    def blog(self):
+        return self._once("blog", lambda: "|".join([
+            _stamp(BlogCategory.objects.all()),
+            _stamp(BlogPost.objects.all()),
+        ]))
+
+    def statuses(self):
+        # ProductStatus has no timestamp, but the table is tiny.
+        return self._once("statuses", lambda: repr(list(
+            ProductStatus.objects.order_by("pk").values_list("pk", "name", "slug")
+        )))
+
+    def page(self, slug):
+        return self._once(f"page:{slug}", lambda: _stamp(PageSEO.objects.filter(slug=slug)))
+
+    def parts(self, name, kwargs):
+        if name in PAGE_SLUGS:
+            parts = [self.page(PAGE_SLUGS[name])]
+            if name in ("home", "enquiry", "products"):
+                parts.append(self.catalog())
+            elif name == "blog":
+                parts.append(self.blog())
+            elif name == "price_list":
+                parts.append(_stamp(PriceList.objects.all(), "updated_date"))
+            return parts
+        if name == "category_products":
+            slug = kwargs["category_slug"]
+            return [
+                _stamp(ProductCategory.objects.filter(slug=slug)),
+                _stamp(Product.objects.filter(category__slug=slug)),
+            ]
+        if name == "product_in_category":
+            return [
+                _stamp(ProductCategory.objects.filter(slug=kwargs["category_slug"])),
+                _stamp(Product.objects.filter(slug=kwargs["product_slug"])),
+                self.statuses(),
+            ]
+        if name == "blog_category":
+            return [self.blog()]
+        if name == "individual_blog":
+            posts = BlogPost.objects.filter(slug=kwargs["slug"])
+            category = posts.values_list("category_id", flat=True).first()
+            # Related posts in the sidebar come from the same category.
+            return [_stamp(posts), _stamp(BlogPost.objects.filter(category_id=category))]
+        if name in ("api_products", "api_categories", "api_products_export"):
+            return [self.catalog()]
+        if name in ("api_blog_posts", "api_blog_categories", "api_blog_posts_export"):
+            return [self.blog()]
+        raise CommandError(f"Don't know what '{name}' is rendered from.")
+
+    def __call__(self, path):
+        match = resolve(path)
+        parts = [self.templates, self.navigation(), *self.parts(match.url_name, match.kwargs)]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def output_name(path, content_type):
+    """``/products/x/`` -> ``products/x/index.html`` (``index.json`` for JSON)."""
+    index = "index.json" if content_type.startswith("application/json") else "index.html"
+    return str(Path(path.strip("/")) / index) if path.strip("/") else index
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every public page and JSON API to static files (with .gz and, "
+        "when brotli is installed, .br variants). Pages whose data has not "
+        "changed since the previous export into the same directory are skipped. "
+        "The paged list APIs are left out, as a static host can't follow their "
+        "?cursor= links; the full lists are exported from their /export/ URLs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output",
+            nargs="?",
+            default=str(Path(settings.BASE_DIR) / "export"),
+            help="Directory to write the site to (default: ./export).",
+        )
+        parser.add_argument(
+            "--host",
+            help="Host the pages are rendered for, used in canonical URLs. "
+                 "Defaults to the first non-wildcard entry of ALLOWED_HOSTS.",
+        )
+        parser.add_argument(
+            "--secure",
+            action="store_true",
+            help="Render as if requested over https.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Render every URL even if it has not changed.",
+        )
+
+    def handle(self, *args, **options):
+        # Exported pages differ from the live ones, so they are rendered with
+        # a cache of their own: none served from, or left in, the site's.
+        with override_settings(STATIC_EXPORT=True, CACHES=EXPORT_CACHES):
+            self.export(options)
+
+    def export(self, options):
+        host = options["host"] or next(
+            (h for h in settings.ALLOWED_HOSTS if h and h != "*" and not h.startswith(".")),
+            None,
+        )
+        if not host:
+            raise CommandError("No host to render for; pass --host.")
+
+        origin = f"{'https' if options['secure'] else 'http'}://{host}"
+        output = Path(options["output"])
+        output.mkdir(parents=True, exist_ok=True)
+        manifest_path = output / MANIFEST_NAME
+        previous = {}
+        if manifest_path.exists() and not options["full"]:
+            previous = json.loads(manifest_path.read_text())
+            if previous.get("origin") != origin:
+                previous = {}
+        previous_files = previous.get("files", {})
+
+        fingerprint = Fingerprints()
+        compressor = Compressor(quiet=True)
+        client = Client(raise_request_exception=False)
+        files = {}
+        rendered = skipped = 0
+
+        for path in public_urls(include_exports=True, include_paged=False):
+            url = origin + path
+            current = fingerprint(path)
+            entry = previous_files.get(path)
+            if entry and entry["fingerprint"] == current and (output / entry["file"]).exists():
+                files[path] = entry
+                skipped += 1
+                continue
+
+            response = client.get(path, HTTP_HOST=host, secure=options["secure"])
+            if response.status_code != 200:
+                self.stderr.write(f"{response.status_code} {url}, not exported")
+                continue
+
+            name = output_name(path, response.get("Content-Type", ""))
+            target = output / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            for suffix in ("", ".gz", ".br"):
+                Path(f"{target}{suffix}").unlink(missing_ok=True)
+            if response.streaming:
+                with target.open("wb") as f:
+                    for chunk in response.streaming_content:
+                        f.write(chunk)
+            else:
+                target.write_bytes(response.content)
+            compressor.compress(str(target))
+
+            files[path] = {"file": name, "fingerprint": current}
+            rendered += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(f"exported {url} -> {name}")
+
+        removed = 0
+        for path, entry in previous_files.items():
+            if path in files:
+                continue
+            for suffix in ("", ".gz", ".br"):
+                Path(f"{output / entry['file']}{suffix}").unlink(missing_ok=True)
+            directory = (output / entry["file"]).parent
+            if directory != output and directory.exists() and not any(directory.iterdir()):
+                directory.rmdir()
+            removed += 1
+
+        tmp_manifest = manifest_path.with_suffix(".tmp")
+        tmp_manifest.write_text(json.dumps({"origin": origin, "files": files}, indent=2, sort_keys=True))
+        os.replace(tmp_manifest, manifest_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {rendered} URLs, {skipped} unchanged, {removed} removed, into {output}."
+        ))
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app import image_resize
+from app.image_resize import image_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show hit/miss totals and disk usage of the /img/ resized image cache. "
+        "Workers report their counts in batches, so the latest few requests "
+        "may not be included yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Clear the totals after printing them.",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Trim the cache to IMAGE_RESIZE_CACHE_MAX_SIZE_MB now.",
+        )
+
+    def handle(self, *args, **options):
+        totals = image_cache_stats.totals()
+        served = sum(totals.values())
+        for outcome, count in totals.items():
+            share = f"{count / served:.1%}" if served else "-"
+            self.stdout.write(f"{outcome:<8} {count:>10}  {share}")
+        self.stdout.write(f"{'total':<8} {served:>10}")
+
+        if options["prune"]:
+            image_resize.prune()
+        files = image_resize.cache_files()
+        size = sum(size for _, size, _ in files)
+        self.stdout.write(
+            f"{len(files)} files, {size / 1024 / 1024:.1f} of "
+            f"{settings.IMAGE_RESIZE_CACHE_MAX_SIZE / 1024 / 1024:.0f} MB"
+        )
+
+        if options["reset"]:
+            image_cache_stats.reset()
+            self.stdout.write(self.style.SUCCESS("Image cache stats reset."))
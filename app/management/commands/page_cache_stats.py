@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from app.cache import page_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show page cache hit/stale/refresh/miss totals. Workers report their "
+        "counts in batches, so the latest few requests may not be included yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Clear the totals after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        totals = page_cache_stats.totals()
+        served = sum(totals.values())
+        for outcome, count in totals.items():
+            share = f"{count / served:.1%}" if served else "-"
+            self.stdout.write(f"{outcome:<8} {count:>10}  {share}")
+        self.stdout.write(f"{'total':<8} {served:>10}")
+
+        if options["reset"]:
+            page_cache_stats.reset()
+            self.stdout.write(self.style.SUCCESS("Page cache stats reset."))
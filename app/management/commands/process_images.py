@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import image_jobs
+from app.models import IMAGE_FAILED, IMAGE_PROCESSING
+
+
+class Command(BaseCommand):
+    help = (
+        "Crop and resize uploaded product and blog images waiting to be "
+        "processed (see app/image_jobs.py). Runs until stopped, checking for "
+        "new uploads every --interval seconds; use with IMAGE_PROCESSING=worker, "
+        "or --once to catch up on images a restarted web worker left pending "
+        "or stuck in processing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the pending images and exit.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds between checks for pending images (default: 5).",
+        )
+        parser.add_argument(
+            "--retry",
+            action="store_true",
+            help=(
+                "First queue failed images again, and images stuck in processing "
+                "(only safe while nothing else is processing images; those "
+                "processing for longer than IMAGE_PROCESSING_TIMEOUT are queued "
+                "again anyway)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["retry"]:
+            for model in image_jobs.IMAGE_FIELDS:
+                count = image_jobs.requeue(model.objects.all(), [IMAGE_FAILED, IMAGE_PROCESSING])
+                self.stdout.write(f"{model._meta.verbose_name_plural}: {count} queued again")
+
+        while True:
+            stale = image_jobs.requeue_stale()
+            if stale:
+                self.stdout.write(f"Queued {stale} images again whose processing timed out.")
+            count = image_jobs.process_pending()
+            if count:
+                self.stdout.write(f"Processed {count} images.")
+            if options["once"]:
+                break
+            if not count:
+                time.sleep(options["interval"])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app import snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the stored API JSON of every product, blog post and category, "
+        "and the category list snapshots. Saving a row keeps its own JSON up to "
+        "date; run this after bulk imports or raw SQL changes."
+    )
+
+    def handle(self, *args, **options):
+        count = snapshots.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt API JSON for {count} rows."))
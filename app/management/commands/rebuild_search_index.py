@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search index of products, blog posts and "
+        "enquiries. Saving or deleting a row keeps the index up to date; run "
+        "this after bulk imports or raw SQL changes."
+    )
+
+    def handle(self, *args, **options):
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products, blog posts and enquiries."))
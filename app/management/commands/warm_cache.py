@@ -0,0 +1,109 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from app.cache import page_cache_stats
+from app.public_urls import public_urls
+
+
+class RateLimiter:
+    """Spread requests evenly so at most ``rate`` start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        time.sleep(max(0, slot - now))
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every public page and API once so the page cache is warm. "
+        "Only useful with the shared cache (SHARED_CACHE=True), since a "
+        "per-process cache would be thrown away when this command exits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--host",
+            action="append",
+            dest="hosts",
+            help="Host (with port if clients send one) to warm; repeatable. "
+                 "Defaults to every non-wildcard entry of ALLOWED_HOSTS.",
+        )
+        parser.add_argument(
+            "--secure",
+            action="store_true",
+            help="Warm https:// URLs (match how requests reach Django).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of pages rendered in parallel (default: 4).",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=0,
+            help="Maximum requests per second, 0 for no limit (default: 0).",
+        )
+        parser.add_argument(
+            "--no-api",
+            action="store_true",
+            help="Skip the JSON API endpoints.",
+        )
+
+    def handle(self, *args, **options):
+        hosts = options["hosts"] or [
+            host for host in settings.ALLOWED_HOSTS
+            if host and host != "*" and not host.startswith(".")
+        ]
+        if not hosts:
+            raise CommandError("No host to warm; pass --host.")
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        paths = list(public_urls(include_api=not options["no_api"]))
+        jobs = [(host, path) for host in hosts for path in paths]
+        limiter = RateLimiter(options["rate"])
+        local = threading.local()
+
+        def fetch(job):
+            host, path = job
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client(raise_request_exception=False)
+            limiter.wait()
+            started = time.monotonic()
+            response = client.get(path, HTTP_HOST=host, secure=options["secure"])
+            return host, path, response.status_code, time.monotonic() - started
+
+        started = time.monotonic()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            for host, path, status, elapsed in executor.map(fetch, jobs):
+                if status != 200:
+                    failed += 1
+                    self.stderr.write(f"{status} {host}{path}")
+                elif options["verbosity"] > 1:
+                    self.stdout.write(f"{status} {host}{path} {elapsed * 1000:.0f}ms")
+        page_cache_stats.flush()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {len(jobs) - failed}/{len(jobs)} URLs in {time.monotonic() - started:.1f}s."
+        ))
+        if failed:
+            raise CommandError(f"{failed} URLs did not return 200.")
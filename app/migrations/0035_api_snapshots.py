@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:35
+
+import django_summernote.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0034_alter_product_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiSnapshot',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'API Snapshot',
+                'verbose_name_plural': 'API Snapshots',
+            },
+        ),
+        migrations.AddField(
+            model_name='blogcategory',
+            name='api_json',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='api_json',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='api_json',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='productcategory',
+            name='api_json',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AlterField(
+            model_name='productcategory',
+            name='description',
+            field=django_summernote.fields.SummernoteTextField(),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:38
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+from app.templatetags.custom_filters import until_period
+
+
+def fill_plain_text(apps, schema_editor):
+    # Same derivation as the models' update_plain_text(), which historical
+    # models don't have.
+    ProductCategory = apps.get_model('app', 'ProductCategory')
+    Product = apps.get_model('app', 'Product')
+    BlogPost = apps.get_model('app', 'BlogPost')
+
+    categories = list(ProductCategory.objects.all())
+    for category in categories:
+        category.description_text = strip_tags(category.description or '')
+    ProductCategory.objects.bulk_update(categories, ['description_text'], batch_size=500)
+
+    products = list(Product.objects.all())
+    for product in products:
+        text = strip_tags(product.description or '')
+        product.description_text = text
+        product.description_excerpt = text[:200] + '...' if len(text) > 200 else text
+        product.description_first_sentence = strip_tags(until_period(product.description))
+        product.content_text = strip_tags(product.content or '')
+    Product.objects.bulk_update(
+        products,
+        ['description_text', 'description_excerpt', 'description_first_sentence', 'content_text'],
+        batch_size=500,
+    )
+
+    posts = list(BlogPost.objects.all())
+    for post in posts:
+        post.content_text = strip_tags(post.content or '')
+    BlogPost.objects.bulk_update(posts, ['content_text'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0035_api_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='content_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='description_excerpt',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='description_first_sentence',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='description_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='productcategory',
+            name='description_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_plain_text, migrations.RunPython.noop),
+    ]
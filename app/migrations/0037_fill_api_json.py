@@ -0,0 +1,80 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# The API JSON as app/snapshots.py built it when this migration was written.
+# Frozen here, as it runs on historical models; later changes to the live
+# serializers are applied by `manage.py rebuild_api_snapshots`.
+
+
+def _excerpt(text, length):
+    return text[:length] + '...' if len(text) > length else text
+
+
+def _category(c):
+    return {'id': c.id, 'name': c.name, 'slug': c.slug}
+
+
+def _product(p):
+    return {
+        'id': p.id,
+        'name': strip_tags(p.name),
+        'slug': p.slug,
+        'description': p.description_excerpt,
+        'image': p.image.url if p.image else '',
+        'category': {
+            'id': p.category.id,
+            'name': strip_tags(p.category.name),
+            'slug': p.category.slug,
+        } if p.category else None,
+    }
+
+
+def _blog_post(post):
+    return {
+        'id': post.id,
+        'title': post.title,
+        'slug': post.slug,
+        'excerpt': _excerpt(post.excerpt, 300),
+        'author': post.author,
+        'published_date': post.published_date.isoformat(),
+        'is_featured': post.is_featured,
+        'featured_image': post.featured_image.url if post.featured_image else None,
+        'category': {
+            'id': post.category.id,
+            'name': post.category.name,
+        } if post.category else None,
+        'tags': [],
+    }
+
+
+def fill_api_json(apps, schema_editor):
+    # Rows that existed before 0035 have no stored API JSON; serving them
+    # would fall back to building it per request with a query per field.
+    for model_name, render, related in (
+        ('ProductCategory', _category, None),
+        ('BlogCategory', _category, None),
+        ('Product', _product, 'category'),
+        ('BlogPost', _blog_post, 'category'),
+    ):
+        model = apps.get_model('app', model_name)
+        queryset = model.objects.filter(api_json=b'')
+        if related:
+            queryset = queryset.select_related(related)
+        instances = list(queryset)
+        for instance in instances:
+            instance.api_json = json.dumps(render(instance), cls=DjangoJSONEncoder).encode()
+        model.objects.bulk_update(instances, ['api_json'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0036_plain_text_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_api_json, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Products are stored under rowid 2 * id and blog posts under 2 * id + 1, so
+# single rows are updated and deleted by rowid (see app/search.py).
+CREATE = [
+    """
+    CREATE VIRTUAL TABLE app_search USING fts5(
+        kind UNINDEXED,
+        published UNINDEXED,
+        title,
+        sku,
+        category,
+        body,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO app_search (rowid, kind, published, title, sku, category, body)
+    SELECT p.id * 2, 'product', 1, p.name, p.sku, c.name,
+           p.description_text || ' ' || p.content_text
+    FROM app_product p LEFT JOIN app_productcategory c ON c.id = p.category_id
+    """,
+    """
+    INSERT INTO app_search (rowid, kind, published, title, sku, category, body)
+    SELECT b.id * 2 + 1, 'blogpost', b.status = 'published', b.title, '', c.name,
+           b.excerpt || ' ' || b.content_text
+    FROM app_blogpost b LEFT JOIN app_blogcategory c ON c.id = b.category_id
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0037_fill_api_json'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, 'DROP TABLE app_search'),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0039_deletion_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(db_index=True, help_text='Stock Keeping Unit - unique product identifier', max_length=100),
+        ),
+    ]
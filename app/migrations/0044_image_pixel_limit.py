@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:09
+
+import app.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0043_image_processing_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blogpost',
+            name='featured_image',
+            field=models.ImageField(blank=True, null=True, upload_to='blog/', validators=[app.images.validate_pixels]),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(upload_to='products/', validators=[app.images.validate_pixels]),
+        ),
+    ]
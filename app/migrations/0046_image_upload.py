@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0045_image_claimed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='featured_image_upload',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_upload',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
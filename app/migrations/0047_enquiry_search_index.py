@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# Enquiries are stored under their own id (see app/search.py).
+CREATE = [
+    """
+    CREATE VIRTUAL TABLE app_enquiry_search USING fts5(
+        sku,
+        name,
+        email,
+        phone,
+        subject,
+        message,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO app_enquiry_search (rowid, sku, name, email, phone, subject, message)
+    SELECT id, COALESCE(sku, ''), name, email, phone, subject, message FROM app_enquiry
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0046_image_upload'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, 'DROP TABLE app_enquiry_search'),
+    ]
@@ -1,10 +1,53 @@
-from django.db import models
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
+import os
+
+from django.db import models, transaction
+from django.utils.html import strip_tags
 from django.utils.text import slugify
 from django_summernote.fields import SummernoteTextField
-import os
+
+from . import images
+from .templatetags.custom_filters import until_period
+
+
+# Processing state of an uploaded image (see app/image_jobs.py).
+IMAGE_PENDING = 'pending'
+IMAGE_PROCESSING = 'processing'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+IMAGE_STATUS_CHOICES = [
+    (IMAGE_PENDING, 'Pending'),
+    (IMAGE_PROCESSING, 'Processing'),
+    (IMAGE_READY, 'Ready'),
+    (IMAGE_FAILED, 'Failed'),
+]
+
+
+def hold_upload(instance, field):
+    """
+    Move the new upload in ``instance.<field>`` to ``images.upload_storage()``
+    and mark it pending; the field keeps the image already stored (if any)
+    until the upload is processed (see app/image_jobs.py).
+    """
+    stored, superseded = None, ''
+    if instance.pk:
+        stored, superseded = type(instance).objects.filter(pk=instance.pk).values_list(
+            field, f'{field}_upload'
+        ).first() or (None, '')
+    field_file = getattr(instance, field)
+    storage = images.upload_storage()
+    name = field_file.field.generate_filename(instance, os.path.basename(field_file.name))
+    setattr(instance, f'{field}_upload', storage.save(name, field_file.file))
+    setattr(instance, field, stored)
+    setattr(instance, f'{field}_status', IMAGE_PENDING)
+    setattr(instance, f'{field}_error', '')
+    if superseded:
+        # An upload still waiting, replaced by this one.
+        transaction.on_commit(lambda: storage.delete(superseded))
+
+
+def excerpt(text, length):
+    """``text`` cut to ``length`` characters, with an ellipsis if it was longer."""
+    return text[:length] + '...' if len(text) > length else text
 
 # Create your models here.
 class ProductCategory(models.Model):
@@ -23,6 +66,17 @@ class ProductCategory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    """Materialized API JSON (see app/snapshots.py)"""
+    api_json = models.BinaryField(editable=False, default=b'')
+
+    """Plain text derived from the HTML fields on save()"""
+    description_text = models.TextField(editable=False, blank=True, default='')
+
+    plain_text_fields = ['description_text']
+
+    def update_plain_text(self):
+        self.description_text = strip_tags(self.description or '')
+
     def get_seo_keywords_list(self):
         """
         Returns the SEO keywords as a list, split by commas.
@@ -33,6 +87,7 @@ class ProductCategory(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        self.update_plain_text()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -60,12 +115,22 @@ class Product(models.Model):
         updated_at (DateTimeField): Timestamp when the product was last updated.
     """
     name = models.CharField(max_length=200)
-    sku = models.CharField(max_length=100,unique=False, help_text="Stock Keeping Unit - unique product identifier")
+    sku = models.CharField(max_length=100,unique=False, db_index=True, help_text="Stock Keeping Unit - unique product identifier")
     slug = models.SlugField(unique=True, blank=True)  # Allow blank so it can be auto-filled
     description =SummernoteTextField()
     content=SummernoteTextField()  # Rich text with Summernote
     category = models.ForeignKey(ProductCategory, on_delete=models.CASCADE, related_name='products')
-    image = models.ImageField(upload_to='products/')
+    image = models.ImageField(upload_to='products/', validators=[images.validate_pixels])
+    # SHA-256 of the upload the current image was made from (see app/images.py).
+    image_hash = models.CharField(max_length=64, editable=False, blank=True, default='')
+    # Resized copies of the image for srcset (see app/images.py).
+    image_derivatives = models.JSONField(editable=False, blank=True, default=dict)
+    image_status = models.CharField(max_length=20, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY, editable=False)
+    image_error = models.TextField(editable=False, blank=True, default='')
+    # When processing of the image started, to spot workers that died on it.
+    image_claimed_at = models.DateTimeField(editable=False, null=True, blank=True)
+    # A new upload waiting to be processed, in images.upload_storage().
+    image_upload = models.CharField(max_length=255, editable=False, blank=True, default='')
 
     """SEO Fields"""
     seo_meta_title = models.CharField(max_length=100, blank=True, null=True)
@@ -76,30 +141,44 @@ class Product(models.Model):
 
     """Timestamps"""
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    """Materialized API JSON (see app/snapshots.py)"""
+    api_json = models.BinaryField(editable=False, default=b'')
+
+    """Plain text derived from the HTML fields on save()"""
+    description_text = models.TextField(editable=False, blank=True, default='')
+    description_excerpt = models.TextField(editable=False, blank=True, default='')
+    description_first_sentence = models.TextField(editable=False, blank=True, default='')
+    content_text = models.TextField(editable=False, blank=True, default='')
+
+    plain_text_fields = ['description_text', 'description_excerpt', 'description_first_sentence', 'content_text']
+
+    def update_plain_text(self):
+        self.description_text = strip_tags(self.description or '')
+        self.description_excerpt = excerpt(self.description_text, 200)
+        # Cut at the first full stop of the HTML, as the until_period filter
+        # followed by striptags did in the templates.
+        self.description_first_sentence = strip_tags(until_period(self.description))
+        self.content_text = strip_tags(self.content or '')
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-
-        if self.image:
-            # Open and crop image
-            img = Image.open(self.image)
-            min_dim = min(img.size)
-            left = (img.width - min_dim) // 2
-            top = (img.height - min_dim) // 2
-            right = left + min_dim
-            bottom = top + min_dim
-            img = img.crop((left, top, right, bottom))
-
-            # Convert to JPEG
-            buffer = BytesIO()
-            img.save(buffer, format='JPEG', quality=85)
-            buffer.seek(0)
-
-            # Extract only the filename (not the path)
-            filename = os.path.basename(self.image.name)
-            self.image.save(filename, ContentFile(buffer.read()), save=False)
+        self.update_plain_text()
+
+        if images.is_new_upload(self.image):
+            digest = images.content_hash(self.image)
+            stored = None
+            if self.pk:
+                stored = Product.objects.filter(pk=self.pk).values_list('image', 'image_hash', 'image_upload').first()
+            if stored and stored[0] and stored[1] == digest and not stored[2]:
+                # The current image uploaded again: keep the processed copy.
+                self.image = stored[0]
+            else:
+                # Cropped and resized off the request.
+                self.image_hash = digest
+                hold_upload(self, 'image')
 
         super().save(*args, **kwargs)
         
@@ -145,6 +224,9 @@ class BlogCategory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Materialized API JSON (see app/snapshots.py)
+    api_json = models.BinaryField(editable=False, default=b'')
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -164,7 +246,13 @@ class BlogPost(models.Model):
     excerpt = models.TextField(max_length=300, help_text="Brief description for preview")
     content = SummernoteTextField()  # Rich text with Summernote
     category = models.ForeignKey(BlogCategory, on_delete=models.CASCADE, related_name='posts')
-    featured_image = models.ImageField(upload_to='blog/', blank=True, null=True)
+    featured_image = models.ImageField(upload_to='blog/', blank=True, null=True, validators=[images.validate_pixels])
+    # Resized copies of the featured image for srcset (see app/images.py).
+    featured_image_derivatives = models.JSONField(editable=False, blank=True, default=dict)
+    featured_image_status = models.CharField(max_length=20, choices=IMAGE_STATUS_CHOICES, default=IMAGE_READY, editable=False)
+    featured_image_error = models.TextField(editable=False, blank=True, default='')
+    featured_image_claimed_at = models.DateTimeField(editable=False, null=True, blank=True)
+    featured_image_upload = models.CharField(max_length=255, editable=False, blank=True, default='')
     author = models.CharField(max_length=100)
     published_date = models.DateTimeField()
     is_featured = models.BooleanField(default=False)
@@ -181,11 +269,28 @@ class BlogPost(models.Model):
 
     """Timestamps"""
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    """Materialized API JSON (see app/snapshots.py)"""
+    api_json = models.BinaryField(editable=False, default=b'')
+
+    """Plain text derived from the HTML fields on save()"""
+    content_text = models.TextField(editable=False, blank=True, default='')
+
+    plain_text_fields = ['content_text']
+
+    def update_plain_text(self):
+        self.content_text = strip_tags(self.content or '')
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        self.update_plain_text()
+
+        if images.is_new_upload(self.featured_image):
+            # Resized off the request.
+            hold_upload(self, 'featured_image')
+
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -317,3 +422,33 @@ class PageSEO(models.Model):
         verbose_name = "Page SEO"
         verbose_name_plural = "Pages SEO"
         ordering = ['-updated_at']
+
+
+class ApiSnapshot(models.Model):
+    """A whole API list response, kept as ready-encoded JSON bytes."""
+    name = models.CharField(max_length=50, primary_key=True)
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "API Snapshot"
+        verbose_name_plural = "API Snapshots"
+
+
+class Deletion(models.Model):
+    """
+    Log of deleted products, blog posts and categories, reported as
+    tombstones to API clients syncing with ``?since=`` (see app/sync.py).
+    """
+    model = models.CharField(max_length=50)
+    object_id = models.PositiveIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}"
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'deleted_at'])]
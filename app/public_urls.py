@@ -0,0 +1,42 @@
+from django.urls import reverse
+
+from .models import ProductCategory, Product, BlogPost, BlogCategory
+
+PAGES = ['home', 'about', 'contact', 'enquiry', 'products', 'blog', 'price_list']
+# Lists served a page at a time, continued through ?cursor= links.
+PAGED_API_ENDPOINTS = ['api_products', 'api_blog_posts']
+API_ENDPOINTS = ['api_products', 'api_categories', 'api_blog_posts', 'api_blog_categories']
+# Full lists, streamed and never page cached, so not worth warming.
+EXPORT_ENDPOINTS = ['api_products_export', 'api_blog_posts_export']
+
+
+def public_urls(include_api=True, include_exports=False, include_paged=True):
+    """
+    Yield the path of every public page that can be rendered from the
+    current data, followed by the JSON APIs (without the paged lists, if
+    ``include_paged`` is false) and, if asked for, the full list exports.
+    """
+    for name in PAGES:
+        yield reverse(name)
+
+    for slug in ProductCategory.objects.values_list('slug', flat=True):
+        yield reverse('category_products', args=[slug])
+
+    products = Product.objects.values_list('category__slug', 'slug').order_by('category__slug', 'slug')
+    for category_slug, product_slug in products:
+        yield reverse('product_in_category', args=[category_slug, product_slug])
+
+    for slug in BlogCategory.objects.values_list('slug', flat=True):
+        yield reverse('blog_category', args=[slug])
+
+    for slug in BlogPost.objects.filter(status='published').values_list('slug', flat=True):
+        yield reverse('individual_blog', args=[slug])
+
+    if include_api:
+        for name in API_ENDPOINTS:
+            if include_paged or name not in PAGED_API_ENDPOINTS:
+                yield reverse(name)
+
+    if include_exports:
+        for name in EXPORT_ENDPOINTS:
+            yield reverse(name)
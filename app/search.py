@@ -0,0 +1,189 @@
+"""
+Full-text search over products and blog posts.
+
+The ``app_search`` SQLite FTS5 table (created in migration 0038) holds one
+row per product and blog post: title, SKU, category name and the plain text
+of the body. Products are stored under rowid ``2 * id`` and posts under
+``2 * id + 1``, so single rows are replaced by rowid. The signal handlers
+keep it in step with saves and deletes; after bulk changes that bypass
+them, ``python manage.py rebuild_search_index`` rebuilds it.
+
+Enquiries, searched in the admin only, are indexed in a table of their own,
+``app_enquiry_search`` (migration 0047), under their id: their contact
+details never share a table with what the public search reads.
+
+User input never reaches the FTS5 query syntax: it is split into words and
+every word is quoted. All words must match, the last one as a prefix so
+results show up while typing.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+PRODUCT = 'product'
+BLOG_POST = 'blogpost'
+ENQUIRY = 'enquiry'
+# Added to 2 * id to get the rowid.
+ROWID_OFFSETS = {PRODUCT: 0, BLOG_POST: 1}
+
+# bm25() weights in column order: kind, published, title, sku, category, body.
+WEIGHTS = (0.0, 0.0, 10.0, 8.0, 3.0, 1.0)
+MAX_TERMS = 10
+
+WORD_RE = re.compile(r'\w+')
+
+INSERT = (
+    'INSERT INTO app_search (rowid, kind, published, title, sku, category, body) '
+    'VALUES (%s, %s, %s, %s, %s, %s, %s)'
+)
+
+REBUILD = [
+    'DELETE FROM app_search',
+    """
+    INSERT INTO app_search (rowid, kind, published, title, sku, category, body)
+    SELECT p.id * 2, 'product', 1, p.name, p.sku, c.name,
+           p.description_text || ' ' || p.content_text
+    FROM app_product p LEFT JOIN app_productcategory c ON c.id = p.category_id
+    """,
+    """
+    INSERT INTO app_search (rowid, kind, published, title, sku, category, body)
+    SELECT b.id * 2 + 1, 'blogpost', b.status = 'published', b.title, '', c.name,
+           b.excerpt || ' ' || b.content_text
+    FROM app_blogpost b LEFT JOIN app_blogcategory c ON c.id = b.category_id
+    """,
+]
+
+ENQUIRY_INSERT = (
+    'INSERT INTO app_enquiry_search (rowid, sku, name, email, phone, subject, message) '
+    'VALUES (%s, %s, %s, %s, %s, %s, %s)'
+)
+
+REBUILD_ENQUIRIES = [
+    'DELETE FROM app_enquiry_search',
+    """
+    INSERT INTO app_enquiry_search (rowid, sku, name, email, phone, subject, message)
+    SELECT id, COALESCE(sku, ''), name, email, phone, subject, message FROM app_enquiry
+    """,
+]
+
+
+def match_expression(text):
+    """FTS5 query for the words in ``text``, or None if it has none."""
+    words = WORD_RE.findall(text or '')[:MAX_TERMS]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+# --- keeping the index up to date ---
+
+def _replace(kind, pk, published, title, sku, category, body):
+    rowid = pk * 2 + ROWID_OFFSETS[kind]
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM app_search WHERE rowid = %s', [rowid])
+        cursor.execute(INSERT, [rowid, kind, published, title, sku, category or '', body])
+
+
+def index_product(product):
+    _replace(
+        PRODUCT, product.pk, True, product.name, product.sku,
+        product.category.name if product.category_id else '',
+        f'{product.description_text} {product.content_text}',
+    )
+
+
+def index_blog_post(post):
+    _replace(
+        BLOG_POST, post.pk, post.status == 'published', post.title, '',
+        post.category.name if post.category_id else '',
+        f'{post.excerpt} {post.content_text}',
+    )
+
+
+def index_enquiry(enquiry):
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM app_enquiry_search WHERE rowid = %s', [enquiry.pk])
+        cursor.execute(ENQUIRY_INSERT, [
+            enquiry.pk, enquiry.sku or '', enquiry.name, enquiry.email, enquiry.phone,
+            enquiry.subject, enquiry.message,
+        ])
+
+
+def remove(kind, pk):
+    with connection.cursor() as cursor:
+        if kind == ENQUIRY:
+            cursor.execute('DELETE FROM app_enquiry_search WHERE rowid = %s', [pk])
+        else:
+            cursor.execute('DELETE FROM app_search WHERE rowid = %s', [pk * 2 + ROWID_OFFSETS[kind]])
+
+
+def rename_category(kind, category):
+    """Store the new name of ``category`` on the rows of its products or posts."""
+    table = 'app_product' if kind == PRODUCT else 'app_blogpost'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE app_search SET category = %s WHERE rowid IN '
+            f'(SELECT id * 2 + %s FROM {table} WHERE category_id = %s)',
+            [category.name, ROWID_OFFSETS[kind], category.pk],
+        )
+
+
+def rebuild():
+    """Refill the whole index, enquiries included, from the database. Returns the row count."""
+    with connection.cursor() as cursor:
+        for statement in REBUILD + REBUILD_ENQUIRIES:
+            cursor.execute(statement)
+        cursor.execute(
+            'SELECT (SELECT COUNT(*) FROM app_search) + (SELECT COUNT(*) FROM app_enquiry_search)'
+        )
+        return cursor.fetchone()[0]
+
+
+# --- querying ---
+
+def matching_ids(kind, text):
+    """
+    Subquery of the ids of ``kind`` rows matching ``text``, for
+    ``filter(pk__in=...)``; None if ``text`` has no words.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return None
+    if kind == ENQUIRY:
+        return RawSQL(
+            'SELECT rowid FROM app_enquiry_search WHERE app_enquiry_search MATCH %s', [expression]
+        )
+    return RawSQL(
+        'SELECT rowid / 2 FROM app_search WHERE app_search MATCH %s AND kind = %s',
+        [expression, kind],
+    )
+
+
+def search(text, kind=None, limit=20, offset=0):
+    """
+    Published products and posts matching ``text``, best first, as dicts
+    with ``kind``, ``id``, ``score`` and a plain-text ``snippet``.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    sql = (
+        f"SELECT rowid, kind, bm25(app_search, {weights}) AS rank, "
+        f"snippet(app_search, 5, '', '', '...', 16) "
+        f"FROM app_search WHERE app_search MATCH %s AND published = 1"
+    )
+    params = [expression]
+    if kind:
+        sql += ' AND kind = %s'
+        params.append(kind)
+    sql += ' ORDER BY rank LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {'kind': kind, 'id': rowid // 2, 'score': round(-rank, 4), 'snippet': snippet}
+        for rowid, kind, rank, snippet in rows
+    ]
@@ -0,0 +1,137 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import cdn, image_jobs, search, snapshots, sync
+from .cache import NAV, CATALOG, BLOG, PRICE_LIST, bump_version, page_scope
+from .models import (
+    ProductCategory, Product, ProductStatus, BlogPost, BlogCategory,
+    PriceList, PageSEO, Enquiry
+)
+
+
+# Connected before the invalidation handlers below, so the API JSON is
+# already up to date by the time cached pages are invalidated.
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=BlogCategory)
+@receiver(post_save, sender=BlogPost)
+def refresh_snapshot(sender, instance, raw=False, **kwargs):
+    if not raw:
+        snapshots.refresh(instance)
+
+
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_delete, sender=BlogCategory)
+def refresh_list_snapshot(sender, **kwargs):
+    snapshots.refresh_lists(sender)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=BlogPost)
+def schedule_image_processing(sender, instance, raw=False, **kwargs):
+    if not raw and image_jobs.is_pending(instance):
+        image_jobs.schedule(instance)
+
+
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=BlogCategory)
+@receiver(post_delete, sender=BlogPost)
+def record_deletion(sender, instance, **kwargs):
+    sync.record_deletion(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_product(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+def index_blog_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_blog_post(instance)
+
+
+@receiver(post_save, sender=Enquiry)
+def index_enquiry(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_enquiry(instance)
+
+
+SEARCH_KINDS = {Product: search.PRODUCT, BlogPost: search.BLOG_POST, Enquiry: search.ENQUIRY}
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=Enquiry)
+def unindex(sender, instance, **kwargs):
+    search.remove(SEARCH_KINDS[sender], instance.pk)
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_save, sender=BlogCategory)
+def index_category_name(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        search.rename_category(
+            search.PRODUCT if sender is ProductCategory else search.BLOG_POST, instance
+        )
+
+
+@receiver([post_save, post_delete], sender=ProductCategory)
+def invalidate_category(sender, instance, **kwargs):
+    bump_version(NAV, CATALOG)
+    cdn.queue_purge(cdn.NAV, cdn.category_tag(instance.slug))
+
+
+# Product fields shown on pages tagged cdn.NAV (and cached under the NAV
+# scope): the menu's product counts per category, and the home page's best
+# sellers. Other product edits leave those pages alone.
+NAV_FIELDS = ('category_id', 'status_id')
+
+
+@receiver(pre_save, sender=Product)
+def remember_nav_fields(sender, instance, raw=False, **kwargs):
+    instance._stored_nav_fields = None
+    if instance.pk and not raw:
+        instance._stored_nav_fields = (
+            sender.objects.filter(pk=instance.pk).values_list(*NAV_FIELDS).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product(sender, instance, signal, created=False, **kwargs):
+    stored = getattr(instance, '_stored_nav_fields', None)
+    moved = stored is not None and stored != tuple(getattr(instance, f) for f in NAV_FIELDS)
+    if created or signal is post_delete or moved:
+        bump_version(NAV, CATALOG)
+        cdn.queue_purge(cdn.NAV, cdn.CATALOG, cdn.product_tag(instance.pk))
+    else:
+        bump_version(CATALOG)
+        cdn.queue_purge(cdn.CATALOG, cdn.product_tag(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=ProductStatus)
+def invalidate_status(sender, **kwargs):
+    # Status names appear on every product page.
+    bump_version(NAV, CATALOG)
+    cdn.queue_purge(cdn.NAV, cdn.CATALOG)
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=BlogCategory)
+def invalidate_blog(sender, **kwargs):
+    bump_version(BLOG)
+    cdn.queue_purge(cdn.BLOG)
+
+
+@receiver([post_save, post_delete], sender=PriceList)
+def invalidate_price_list(sender, **kwargs):
+    bump_version(PRICE_LIST)
+    cdn.queue_purge(cdn.PRICE_LIST)
+
+
+@receiver([post_save, post_delete], sender=PageSEO)
+def invalidate_page(sender, instance, **kwargs):
+    bump_version(page_scope(instance.slug))
+    cdn.queue_purge(cdn.page_tag(instance.slug))
@@ -0,0 +1,168 @@
+"""
+Materialized JSON for the APIs.
+
+Every product, blog post and category keeps its full API representation as
+ready-encoded bytes in its ``api_json`` column. The signal handlers refresh
+it when the row is saved, together with the rows that embed it (a
+category's products, a blog category's posts). List pages are then built by
+joining those bytes instead of serializing rows on every request. The
+category lists, which are always returned whole, are additionally kept as
+one ``ApiSnapshot`` blob each.
+
+Rows saved before this existed have an empty ``api_json`` and are serialized
+on the fly until ``python manage.py rebuild_api_snapshots`` fills them in.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.html import strip_tags
+
+from .models import ApiSnapshot, BlogCategory, BlogPost, Product, ProductCategory, excerpt
+
+
+# Field name -> (columns it reads, how it is rendered).
+PRODUCT_FIELDS = {
+    'id': ((), lambda p: p.id),
+    'name': (('name',), lambda p: strip_tags(p.name)),
+    'slug': (('slug',), lambda p: p.slug),
+    'description': (('description_excerpt',), lambda p: p.description_excerpt),
+    'image': (('image',), lambda p: p.image.url if p.image else ''),
+    'category': (('category__id', 'category__name', 'category__slug'), lambda p: {
+        'id': p.category.id,
+        'name': strip_tags(p.category.name),
+        'slug': p.category.slug,
+    } if p.category else None),
+}
+
+BLOG_POST_FIELDS = {
+    'id': ((), lambda post: post.id),
+    'title': (('title',), lambda post: post.title),
+    'slug': (('slug',), lambda post: post.slug),
+    'excerpt': (('excerpt',), lambda post: excerpt(post.excerpt, 300)),
+    'author': (('author',), lambda post: post.author),
+    'published_date': (('published_date',), lambda post: post.published_date.isoformat()),
+    'is_featured': (('is_featured',), lambda post: post.is_featured),
+    'featured_image': (('featured_image',), lambda post: post.featured_image.url if post.featured_image else None),
+    'category': (('category__id', 'category__name'), lambda post: {
+        'id': post.category.id,
+        'name': post.category.name,
+    } if post.category else None),
+    'tags': ((), lambda post: post.get_tags_list() if hasattr(post, 'get_tags_list') else []),
+}
+
+CATEGORY_FIELDS = {
+    'id': ((), lambda c: c.id),
+    'name': (('name',), lambda c: c.name),
+    'slug': (('slug',), lambda c: c.slug),
+}
+
+MODEL_FIELDS = {
+    Product: PRODUCT_FIELDS,
+    BlogPost: BLOG_POST_FIELDS,
+    ProductCategory: CATEGORY_FIELDS,
+    BlogCategory: CATEGORY_FIELDS,
+}
+
+# ApiSnapshot name -> model whose rows make up the list.
+LISTS = {
+    'categories': ProductCategory,
+    'blog-categories': BlogCategory,
+}
+
+
+def encode(data):
+    # Same encoder and separators as JsonResponse, so joined fragments are
+    # byte-for-byte what serializing the whole list would produce.
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def build(instance):
+    """The ``api_json`` bytes for ``instance``."""
+    fields = MODEL_FIELDS[type(instance)]
+    return encode({name: render(instance) for name, (_, render) in fields.items()})
+
+
+def fragment(instance):
+    """Stored ``api_json`` of ``instance``, or freshly built if not yet stored."""
+    return bytes(instance.api_json) or build(instance)
+
+
+def page(items, next_url, extra=None):
+    """
+    A ``{"results": [...], "next": ...}`` API page from stored fragments,
+    followed by the keys of ``extra``.
+    """
+    parts = [
+        b'{"results": [', b', '.join(fragment(item) for item in items),
+        b'], "next": ', encode(next_url),
+    ]
+    for key, value in (extra or {}).items():
+        parts += [b', ', encode(key), b': ', encode(value)]
+    parts.append(b'}')
+    return b''.join(parts)
+
+
+def get_list(name):
+    """The stored blob for list ``name``, rebuilt if missing."""
+    data = ApiSnapshot.objects.filter(name=name).values_list('data', flat=True).first()
+    return bytes(data) if data is not None else rebuild_list(name)
+
+
+def rebuild_list(name):
+    items = LISTS[name].objects.only('api_json', 'name', 'slug')
+    data = b'[' + b', '.join(fragment(item) for item in items) + b']'
+    ApiSnapshot.objects.update_or_create(name=name, defaults={'data': data})
+    return data
+
+
+def refresh_lists(model):
+    """Rebuild the list blobs made of ``model`` rows."""
+    for name, list_model in LISTS.items():
+        if list_model is model:
+            rebuild_list(name)
+
+
+def _store(instances):
+    for instance in instances:
+        instance.api_json = build(instance)
+    if instances:
+        # bulk_update writes only this column: no signals, and updated_at
+        # keeps meaning "edited in the admin".
+        type(instances[0]).objects.bulk_update(instances, ['api_json'], batch_size=500)
+
+
+def refresh(instance):
+    """Rebuild the JSON of ``instance`` and of every row embedding it."""
+    _store([instance])
+    if isinstance(instance, ProductCategory):
+        products = list(instance.products.all())
+        for product in products:
+            product.category = instance
+        _store(products)
+    elif isinstance(instance, BlogCategory):
+        posts = list(instance.posts.all())
+        for post in posts:
+            post.category = instance
+        _store(posts)
+    refresh_lists(type(instance))
+
+
+def rebuild_all(batch_size=1000):
+    """Rebuild every row's JSON and every list blob. Returns the row count."""
+    count = 0
+    for model in (ProductCategory, BlogCategory, Product, BlogPost):
+        queryset = model.objects.order_by('pk')
+        if model in (Product, BlogPost):
+            queryset = queryset.select_related('category')
+        batch = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) == batch_size:
+                _store(batch)
+                count += len(batch)
+                batch = []
+        _store(batch)
+        count += len(batch)
+    for name in LISTS:
+        rebuild_list(name)
+    return count
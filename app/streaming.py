@@ -0,0 +1,67 @@
+"""
+Streaming JSON responses.
+
+``StreamingJsonResponse`` writes a JSON array item by item while the rows
+are read from the database in chunks with ``QuerySet.iterator()``, so a
+response of any length is served in constant memory and its first bytes go
+out before the last row is read. Items are gathered into writes of about
+``BUFFER_SIZE`` bytes rather than one write per row.
+
+Items are encoded with orjson when it is installed, and with the standard
+library (plus Django's encoder for dates, decimals and the like) otherwise.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BUFFER_SIZE = 64 * 1024
+CHUNK_SIZE = 2000
+
+_default = DjangoJSONEncoder().default
+
+
+def dumps(data):
+    """Encode ``data`` as JSON bytes with the fastest available encoder."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def encode_items(queryset, render, chunk_size=CHUNK_SIZE):
+    """
+    Yield ``render(obj)`` for every row of ``queryset``, read ``chunk_size``
+    rows at a time. ``render`` returns either ready-encoded bytes or data
+    for ``dumps()``.
+    """
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        item = render(obj)
+        yield item if isinstance(item, bytes) else dumps(item)
+
+
+def json_array_chunks(items, buffer_size=BUFFER_SIZE):
+    """Join encoded ``items`` into a JSON array, yielded in ~``buffer_size`` pieces."""
+    buffer = bytearray(b'[')
+    separator = b''
+    for item in items:
+        buffer += separator
+        buffer += item
+        separator = b', '
+        if len(buffer) >= buffer_size:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b']'
+    yield bytes(buffer)
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    """A JSON array response streamed from an iterable of encoded items."""
+
+    def __init__(self, items, buffer_size=BUFFER_SIZE, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(json_array_chunks(items, buffer_size), **kwargs)
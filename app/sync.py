@@ -0,0 +1,86 @@
+"""
+Delta sync for the list APIs.
+
+With ``?since=`` (an ISO 8601 time or a Unix timestamp), ``/api/products/``
+and ``/api/blog-posts/`` list only the rows saved since then, plus those
+whose category was saved since then, as the category is part of their JSON.
+The first page (the one without a ``cursor``) also carries:
+
+- ``deleted``: ids of the rows deleted since then, from the ``Deletion``
+  log (for blog posts, also posts taken out of publication), by kind;
+- ``since``: the value to send on the next sync.
+
+Clients apply ``deleted`` before ``results``, since SQLite may hand a
+deleted row's id to a new row.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Deletion
+from .pagination import InvalidQuery
+
+# A row saved by a transaction that was still open when a sync ran can carry
+# an updated_at before that sync's time. Each sync starts this far back to
+# pick such rows up; clients treat items they already have as updates.
+OVERLAP = datetime.timedelta(seconds=30)
+
+
+def _retention():
+    return datetime.timedelta(days=settings.API_DELETION_RETENTION_DAYS)
+
+
+def get_since(request):
+    """The ``?since=`` time as an aware datetime, or None."""
+    value = request.GET.get('since')
+    if not value:
+        return None
+    try:
+        since = parse_datetime(value)
+        if since is None:
+            since = datetime.datetime.fromtimestamp(float(value), tz=datetime.timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise InvalidQuery('since must be an ISO 8601 time or a Unix timestamp')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, datetime.timezone.utc)
+    if since < timezone.now() - _retention():
+        raise InvalidQuery('since is older than the deletion log; fetch the full list instead')
+    return since
+
+
+def next_since():
+    """The ``since`` for the client's next sync."""
+    start = timezone.now().astimezone(datetime.timezone.utc) - OVERLAP
+    return start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def changed(queryset, since, category_model):
+    """Rows of ``queryset`` saved since ``since`` or in a category saved since."""
+    categories = category_model.objects.filter(updated_at__gte=since).values('pk')
+    return queryset.filter(Q(updated_at__gte=since) | Q(category_id__in=categories))
+
+
+def record_deletion(instance):
+    model = instance._meta.label_lower
+    Deletion.objects.create(model=model, object_id=instance.pk)
+    Deletion.objects.filter(model=model, deleted_at__lt=timezone.now() - _retention()).delete()
+
+
+def deleted_ids(model, since):
+    return list(
+        Deletion.objects.filter(model=model._meta.label_lower, deleted_at__gte=since)
+        .order_by('object_id').values_list('object_id', flat=True).distinct()
+    )
+
+
+def first_page_extra(request, since, deleted):
+    """
+    The keys added to the first page of a sync: ``deleted()``, which returns
+    the ids by kind, and the next ``since``.
+    """
+    if since is None or request.GET.get('cursor'):
+        return {}
+    return {'deleted': deleted(), 'since': next_since()}
@@ -0,0 +1,39 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from app.images import MIME_TYPES, current_derivatives
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, derivatives, sizes='100vw', **attrs):
+    """
+    A ``<picture>`` offering the derivatives of ``image`` (recorded in
+    ``derivatives``) as srcsets per format, around an ``<img>`` of the
+    original with its width and height. Other attributes (``alt``,
+    ``class``, ``loading``...) go on the ``<img>``. Without derivatives for
+    the current file, just the ``<img>``.
+
+        {% responsive_image product.image product.image_derivatives sizes="50vw" alt=product.name %}
+    """
+    if not image:
+        return ''
+    attrs = {'src': image.url, **attrs}
+    record = current_derivatives(image, derivatives)
+    if record is None:
+        return format_html('<img{}>', flatatt(attrs))
+
+    attrs.setdefault('width', record['width'])
+    attrs.setdefault('height', record['height'])
+    storage = image.storage
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+        (
+            MIME_TYPES[fmt],
+            ', '.join(f'{storage.url(name)} {width}w' for width, name in entries),
+            sizes,
+        )
+        for fmt, entries in record['formats'].items() if fmt in MIME_TYPES
+    ))
+    return format_html('<picture>{}<img{}></picture>', sources, flatatt(attrs))
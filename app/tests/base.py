@@ -0,0 +1,36 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.models import BlogPost, Product
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    EDGE_CACHE_TIMEOUT=0,
+    CDN_PURGER={'BACKEND': 'app.cdn.LogPurger'},
+)
+class CacheTestCase(TestCase):
+    """A test case with an empty in-memory cache, whatever the settings use."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+def make_product(category, name='Product', **fields):
+    """A product with a stored image name, so no image job is scheduled."""
+    fields.setdefault('sku', name.upper().replace(' ', '-'))
+    fields.setdefault('image', 'products/x.jpg')
+    return Product.objects.create(name=name, category=category, **fields)
+
+
+def make_post(category, title='Post', **fields):
+    fields.setdefault('excerpt', '')
+    fields.setdefault('content', '')
+    fields.setdefault('author', 'Arivas')
+    fields.setdefault('published_date', timezone.now())
+    fields.setdefault('status', 'published')
+    return BlogPost.objects.create(title=title, category=category, **fields)
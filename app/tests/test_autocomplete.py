@@ -0,0 +1,52 @@
+from unittest import mock
+
+from app import autocomplete
+from app.models import ProductCategory
+from app.tests.base import CacheTestCase, make_product
+
+
+class AutocompleteTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        # Each test starts without the worker's index.
+        state = mock.patch.dict(autocomplete._state, {'index': None, 'version': None, 'checked': 0.0})
+        state.start()
+        self.addCleanup(state.stop)
+        category = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        self.ari = make_product(category, 'Ari-Bact 500', sku='AB500')
+        self.zinc = make_product(category, 'Zinc Ari', sku='ZN-1')
+        self.other = make_product(category, 'Omeprazole', sku='OME-20')
+
+    def suggest(self, q, **params):
+        response = self.client.get('/api/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()]
+
+    def test_name_start_before_later_word(self):
+        self.assertEqual(self.suggest('ari'), [self.ari.pk, self.zinc.pk])
+
+    def test_normalized_match(self):
+        self.assertEqual(self.suggest('ARI B'), [self.ari.pk])
+        self.assertEqual(self.suggest('ári-bact'), [self.ari.pk])
+
+    def test_sku(self):
+        self.assertEqual(self.suggest('ome20'), [self.other.pk])
+
+    def test_suggestion_fields(self):
+        response = self.client.get('/api/autocomplete/', {'q': 'zinc'})
+        self.assertEqual(response.json(), [{
+            'id': self.zinc.pk, 'name': 'Zinc Ari', 'sku': 'ZN-1',
+            'url': f'/products/capsules/{self.zinc.slug}/',
+        }])
+
+    def test_limit(self):
+        self.assertEqual(len(self.suggest('a', limit=1)), 1)
+        self.assertEqual(self.client.get('/api/autocomplete/', {'q': 'a', 'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.suggest(''), [])
+
+    def test_index_rebuilt_after_catalog_change(self):
+        self.assertEqual(self.suggest('ome'), [self.other.pk])
+        self.other.name = 'Esomeprazole'
+        self.other.save()
+        autocomplete._state['checked'] = 0.0  # past CHECK_INTERVAL
+        self.assertEqual(self.suggest('esome'), [self.other.pk])
@@ -0,0 +1,48 @@
+import json
+
+from django.test import override_settings
+
+from app.models import ProductCategory
+from app.tests.base import CacheTestCase, make_product
+
+
+class BatchLookupTests(CacheTestCase):
+    url = '/api/products/batch/'
+
+    def setUp(self):
+        super().setUp()
+        category = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        self.products = [make_product(category, f'Product {i}') for i in range(4)]
+
+    def post(self, body):
+        return self.client.post(self.url, json.dumps(body), content_type='application/json')
+
+    def test_lookup_by_each_key(self):
+        a, b, c, _ = self.products
+        response = self.client.get(self.url, {'ids': f'{a.pk},999', 'skus': b.sku, 'slugs': f'{c.slug},nope'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['results']], [a.pk, b.pk, c.pk])
+        self.assertEqual(data['missing'], {'ids': [999], 'skus': [], 'slugs': ['nope']})
+        # In the list API's form.
+        self.assertEqual(data['results'][0], self.client.get('/api/products/').json()['results'][0])
+
+    def test_post_and_fields(self):
+        a, b = self.products[:2]
+        response = self.post({'ids': [a.pk], 'skus': [b.sku, b.sku]})
+        self.assertEqual([item['id'] for item in response.json()['results']], [a.pk, b.pk])
+        response = self.client.get(self.url, {'ids': a.pk, 'fields': 'id,name'})
+        self.assertEqual(response.json()['results'], [{'id': a.pk, 'name': 'Product 0'}])
+
+    @override_settings(API_BATCH_SIZE=2)
+    def test_bad_requests(self):
+        for response in (
+            self.client.get(self.url),
+            self.client.get(self.url, {'ids': 'one'}),
+            self.client.get(self.url, {'skus': 'A,B,C'}),
+            self.post(['not', 'an', 'object']),
+            self.post({'ids': 'not a list'}),
+            self.client.post(self.url, 'not json', content_type='application/json'),
+        ):
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
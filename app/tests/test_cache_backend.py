@@ -0,0 +1,114 @@
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from arivas.cache_backends import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.location = str(Path(directory) / 'cache.sqlite3')
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'TIMEOUT': 300, 'OPTIONS': options})
+
+    def rows(self, cache):
+        return dict(cache._connection().execute('SELECT key, size FROM cache_entries'))
+
+    def test_add_keeps_live_key(self):
+        cache = self.make_cache()
+        cache.set('key', 'first')
+        self.assertFalse(cache.add('key', 'second'))
+        self.assertEqual(cache.get('key'), 'first')
+
+    def test_add_overwrites_expired_key(self):
+        cache = self.make_cache(L1_MAX_ENTRIES=0)
+        cache.set('key', 'first', timeout=0)
+        self.assertIsNone(cache.get('key'))
+        self.assertTrue(cache.add('key', 'second'))
+        self.assertEqual(cache.get('key'), 'second')
+
+    def test_incr_missing_key(self):
+        cache = self.make_cache()
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set('expired', 1, timeout=0)
+        with self.assertRaises(ValueError):
+            cache.incr('expired')
+
+    def test_incr_concurrent(self):
+        cache = self.make_cache()
+        cache.set('counter', 0, timeout=None)
+        threads_count, increments = 8, 50
+
+        def work():
+            # Its own instance, like another worker process.
+            other = self.make_cache()
+            for _ in range(increments):
+                other.incr('counter')
+
+        threads = [threading.Thread(target=work) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.make_cache().get('counter'), threads_count * increments)
+
+    def test_cull_drops_expired_entries(self):
+        cache = self.make_cache(CULL_EVERY=1)
+        cache.set('version', 1, timeout=None)
+        cache.set('expired', 'x', timeout=0)
+        cache.set('live', 'x')
+        self.assertEqual(set(self.rows(cache)), {
+            cache.make_key('version'), cache.make_key('live'),
+        })
+
+    def test_cull_to_max_size_keeps_non_expiring_keys(self):
+        max_size = 4000
+        cache = self.make_cache(CULL_EVERY=1, MAX_SIZE=max_size)
+        cache.set('version', 1, timeout=None)
+        for i in range(50):
+            cache.set(f'page{i}', 'x' * 200, timeout=300 + i)
+        rows = self.rows(cache)
+        self.assertLessEqual(sum(rows.values()), max_size)
+        self.assertIn(cache.make_key('version'), rows)
+        # The entries closest to expiry went first.
+        self.assertNotIn(cache.make_key('page0'), rows)
+        self.assertIn(cache.make_key('page49'), rows)
+
+    def test_cull_to_max_entries_keeps_non_expiring_keys(self):
+        cache = self.make_cache(CULL_EVERY=1, MAX_ENTRIES=10)
+        cache.set('version', 1, timeout=None)
+        for i in range(30):
+            cache.set(f'page{i}', i, timeout=300 + i)
+        rows = self.rows(cache)
+        self.assertLessEqual(len(rows), 10)
+        self.assertIn(cache.make_key('version'), rows)
+
+    def test_stale_l1_entry_expires(self):
+        l1_timeout = 0.2
+        writer = self.make_cache(L1_TIMEOUT=l1_timeout)
+        reader = self.make_cache(L1_TIMEOUT=l1_timeout)
+        writer.set('key', 'old')
+        self.assertEqual(reader.get('key'), 'old')
+        writer.set('key', 'new')
+        # The reader's in-memory copy is trusted for up to L1_TIMEOUT...
+        self.assertEqual(reader.get('key'), 'old')
+        time.sleep(l1_timeout + 0.05)
+        # ...and then read again from SQLite.
+        self.assertEqual(reader.get('key'), 'new')
+
+    def test_lock_release_seen_at_once(self):
+        holder = self.make_cache(L1_TIMEOUT=60)
+        waiter = self.make_cache(L1_TIMEOUT=60)
+        self.assertTrue(holder.add('page.lock', 1))
+        self.assertEqual(waiter.get_many(['page', 'page.lock']), {'page.lock': 1})
+        holder.set('page', 'rendered')
+        holder.delete('page.lock')
+        self.assertEqual(waiter.get_many(['page', 'page.lock']), {'page': 'rendered'})
@@ -0,0 +1,103 @@
+import threading
+from unittest import mock
+
+from django.test import override_settings
+
+from app import cdn
+from app.models import PageSEO, ProductCategory
+from .base import CacheTestCase, make_product
+
+
+class RecordingPurger(cdn.BasePurger):
+    """Fails the first ``failures`` purges, then records the tags and thread of each."""
+
+    def __init__(self, failures=0):
+        super().__init__()
+        self.failures = failures
+        self.purged = []
+
+    def purge(self, tags):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('CDN unreachable')
+        self.purged.append((list(tags), threading.current_thread()))
+
+
+def wait_for_purges():
+    cdn._get_executor().submit(lambda: None).result()
+
+
+@override_settings(CDN_PURGE_RETRIES=2, CDN_PURGE_RETRY_DELAY=0)
+class PurgeQueueTests(CacheTestCase):
+    def purge_with(self, purger, *tags):
+        with mock.patch.object(cdn, 'get_purger', return_value=purger):
+            with self.captureOnCommitCallbacks(execute=True):
+                cdn.queue_purge(*tags)
+            wait_for_purges()
+
+    def test_purged_off_the_request_thread(self):
+        purger = RecordingPurger()
+        self.purge_with(purger, cdn.CATALOG, cdn.product_tag(1))
+        [(tags, thread)] = purger.purged
+        self.assertEqual(tags, [cdn.CATALOG, cdn.product_tag(1)])
+        self.assertIsNot(thread, threading.current_thread())
+
+    def test_failed_purge_retried(self):
+        purger = RecordingPurger(failures=2)
+        with self.assertLogs('app.cdn', 'WARNING'):
+            self.purge_with(purger, cdn.NAV)
+        self.assertEqual([tags for tags, _ in purger.purged], [[cdn.NAV]])
+
+    def test_gives_up_after_retries(self):
+        purger = RecordingPurger(failures=3)
+        with self.assertLogs('app.cdn', 'ERROR'):
+            self.purge_with(purger, cdn.NAV)
+        self.assertEqual(purger.purged, [])
+
+
+@override_settings(EDGE_CACHE_TIMEOUT=3600)
+class CacheTagTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        self.product = make_product(self.category, 'Omeprazole')
+
+    def tags(self, url):
+        response = self.client.get(url)
+        self.assertIn('s-maxage=3600', response['Cache-Control'])
+        return set(response['Cache-Tag'].split(','))
+
+    def purged(self, change):
+        # setUp's saves never committed, so their tags are still queued.
+        cdn._pending.tags = set()
+        purger = RecordingPurger()
+        with mock.patch.object(cdn, 'get_purger', return_value=purger):
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            wait_for_purges()
+        return {tag for tags, _ in purger.purged for tag in tags}
+
+    def test_pages_tagged_with_their_content(self):
+        self.assertEqual(
+            self.tags(f'/products/capsules/{self.product.slug}/'),
+            {cdn.NAV, cdn.product_tag(self.product.pk), cdn.category_tag('capsules')},
+        )
+        self.assertEqual(
+            self.tags('/products/capsules/'), {cdn.NAV, cdn.CATALOG, cdn.category_tag('capsules')}
+        )
+        self.assertEqual(self.tags('/about/'), {cdn.NAV, cdn.page_tag('about')})
+        self.assertEqual(self.tags('/api/products/'), {cdn.CATALOG})
+
+    def test_product_edit_purges_its_pages(self):
+        self.assertEqual(
+            self.purged(self.product.save), {cdn.CATALOG, cdn.product_tag(self.product.pk)}
+        )
+
+    def test_new_product_purges_menu(self):
+        self.assertIn(cdn.NAV, self.purged(lambda: make_product(self.category, 'Pantoprazole')))
+
+    def test_page_seo_purges_its_page(self):
+        purged = self.purged(
+            lambda: PageSEO.objects.create(title='About', slug='about', content1='<p>About us.</p>')
+        )
+        self.assertEqual(purged, {cdn.page_tag('about')})
@@ -0,0 +1,62 @@
+import gzip
+from unittest import skipIf
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from app import compression
+from app.models import ProductCategory
+from app.tests.base import CacheTestCase, make_product
+
+
+class CompressionTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        category = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        make_product(category, 'Omeprazole')
+        self.plain = self.client.get('/products/capsules/', HTTP_ACCEPT_ENCODING='').content
+
+    def get(self, url, accept_encoding):
+        return self.client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    def test_gzip_variant(self):
+        response = self.get('/products/capsules/', 'gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        # The variant stored with the page, not gzipped again per request.
+        self.assertEqual(response.content, compression._gzip(self.plain))
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        response = self.get('/products/capsules/', 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), self.plain)
+
+    def test_identity(self):
+        response = self.get('/products/capsules/', 'identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.plain)
+
+    def test_token_page_gzipped_per_request(self):
+        first = self.get('/enquiry/', 'gzip')
+        second = self.get('/enquiry/', 'gzip')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        # Each carries its visitor's token, so the bodies differ.
+        self.assertNotEqual(gzip.decompress(first.content), gzip.decompress(second.content))
+
+    def test_refused_encodings(self):
+        variants = {'gzip': b'compressed'}
+        for header, expected in [
+            ('', None),
+            ('gzip;q=0', None),
+            ('*', 'gzip'),
+            ('*, gzip;q=0', None),
+            ('GZIP;q=0.5', 'gzip'),
+        ]:
+            request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(compression.choose_encoding(request, variants), expected, header)
+
+    def test_small_and_binary_responses_not_precompressed(self):
+        self.assertEqual(compression.precompress(HttpResponse('short')), {})
+        image = HttpResponse(b'\xff' * 1000, content_type='image/jpeg')
+        self.assertEqual(compression.precompress(image), {})
@@ -0,0 +1,45 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from app.models import ProductCategory
+from app.tests.base import CacheTestCase, make_product
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ExportSiteTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        category = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        self.products = [make_product(category, f'Product {i}') for i in range(5)]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.output = Path(directory)
+
+    def export(self):
+        call_command('export_site', str(self.output), host='example.com', stdout=StringIO(), stderr=StringIO())
+
+    def test_paged_apis_left_out(self):
+        self.export()
+        self.assertFalse((self.output / 'api/products/index.json').exists())
+        self.assertFalse((self.output / 'api/blog-posts/index.json').exists())
+        exported = json.loads((self.output / 'api/products/export/index.json').read_text())
+        self.assertEqual(len(exported), 5)
+
+    def test_products_page_lists_everything(self):
+        self.export()
+        html = (self.output / 'products/index.html').read_text()
+        self.assertNotIn('rel="next"', html)
+        for product in self.products:
+            self.assertIn(f'/products/capsules/{product.slug}/', html)
+
+    def test_live_pages_unaffected(self):
+        self.export()
+        response = self.client.get('/products/')
+        self.assertEqual(len(response.context['products']), 2)
+        self.assertIsNotNone(response.context['next_page'])
@@ -0,0 +1,118 @@
+import datetime
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from PIL import Image
+
+from app import image_jobs, images
+from app.models import IMAGE_FAILED, IMAGE_PENDING, IMAGE_PROCESSING, IMAGE_READY, Product, ProductCategory
+from .base import CacheTestCase, make_product
+
+
+def jpeg_upload(name='photo.jpg', size=(300, 200)):
+    """A JPEG with GPS data in its EXIF, as a phone would upload it."""
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    exif.get_ifd(0x8825)[2] = (51.0, 30.0, 0.0)  # GPSLatitude
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageJobTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        media, uploads = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.addCleanup(shutil.rmtree, uploads)
+        settings = override_settings(
+            MEDIA_ROOT=media, IMAGE_UPLOAD_DIR=uploads, IMAGE_PROCESSING='worker',
+            IMAGE_DERIVATIVE_WIDTHS=[100], IMAGE_DERIVATIVE_FORMATS=['webp'],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.category = ProductCategory.objects.create(name='Capsule', slug='capsule', description='')
+
+    def upload(self, product, file):
+        product.image = file
+        product.save()
+        product.refresh_from_db()
+        return product
+
+    def test_upload_is_not_public_until_processed(self):
+        product = self.upload(Product(category=self.category, name='New', sku='NEW'), jpeg_upload())
+        self.assertEqual(product.image_status, IMAGE_PENDING)
+        self.assertFalse(product.image)
+        self.assertTrue(images.upload_storage().exists(product.image_upload))
+
+        self.assertTrue(image_jobs.process(Product, product.pk))
+        product.refresh_from_db()
+        self.assertEqual(product.image_status, IMAGE_READY)
+        self.assertEqual(product.image_upload, '')
+        self.assertTrue(product.image.name.startswith('products/'))
+        with product.image.open('rb') as f, Image.open(f) as img:
+            self.assertEqual(img.size, (200, 200))
+            self.assertNotIn('exif', img.info)
+        self.assertEqual(product.image_derivatives['source'], product.image.name)
+        self.assertFalse(images.upload_storage().listdir('products')[1])
+
+    def test_previous_image_shown_while_pending(self):
+        product = self.upload(Product(category=self.category, name='New', sku='NEW'), jpeg_upload())
+        image_jobs.process(Product, product.pk)
+        product.refresh_from_db()
+        processed = product.image.name
+
+        product = self.upload(product, jpeg_upload('other.jpg', (400, 300)))
+        self.assertEqual(product.image_status, IMAGE_PENDING)
+        self.assertEqual(product.image.name, processed)
+
+    def test_failed_upload_stays_private(self):
+        broken = SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+        product = self.upload(Product(category=self.category, name='New', sku='NEW'), broken)
+        with self.assertLogs('app.image_jobs', 'ERROR'):
+            image_jobs.process(Product, product.pk)
+        product.refresh_from_db()
+        self.assertEqual(product.image_status, IMAGE_FAILED)
+        self.assertFalse(product.image)
+        self.assertTrue(images.upload_storage().exists(product.image_upload))
+
+        # Kept for "Process images again".
+        self.assertEqual(image_jobs.requeue(Product.objects.filter(pk=product.pk)), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.image_status, IMAGE_PENDING)
+
+    def test_reprocess_existing_image(self):
+        product = self.upload(Product(category=self.category, name='New', sku='NEW'), jpeg_upload())
+        image_jobs.process(Product, product.pk)
+        product.refresh_from_db()
+        first = product.image.name
+
+        image_jobs.requeue(Product.objects.filter(pk=product.pk))
+        image_jobs.process(Product, product.pk)
+        product.refresh_from_db()
+        self.assertEqual(product.image_status, IMAGE_READY)
+        self.assertNotEqual(product.image.name, first)
+        self.assertFalse(product.image.storage.exists(first))
+
+    def test_requeue_skips_rows_without_image(self):
+        make_product(self.category, image='')
+        self.assertEqual(image_jobs.requeue(Product.objects.all()), 0)
+
+    def test_thread_job_requeues_stale_claims(self):
+        stale = self.upload(Product(category=self.category, name='Stale', sku='STALE'), jpeg_upload())
+        # Claimed by a worker that died.
+        Product.objects.filter(pk=stale.pk).update(
+            image_status=IMAGE_PROCESSING, image_claimed_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        product = self.upload(Product(category=self.category, name='New', sku='NEW'), jpeg_upload())
+        # Left open: the test's connection holds its transaction.
+        with mock.patch.object(image_jobs, 'connections'):
+            image_jobs._process_in_thread(Product, product.pk)
+        self.assertEqual(
+            set(Product.objects.values_list('image_status', flat=True)), {IMAGE_READY}
+        )
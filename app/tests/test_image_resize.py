@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from PIL import Image
+
+from app import image_resize
+from app.tests.base import CacheTestCase
+
+
+class ResizedImageTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        media, cache_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.addCleanup(shutil.rmtree, cache_dir)
+        settings = override_settings(
+            MEDIA_ROOT=media, IMAGE_RESIZE_CACHE_DIR=cache_dir,
+            IMAGE_RESIZE_SIZES=['160x160'], IMAGE_DERIVATIVE_FORMATS=['webp'],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store('products/a.jpg', 'JPEG')
+
+    def store(self, name, fmt, size=(400, 200)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'blue').save(buffer, fmt)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def fetch(self, path, accept='image/webp,*/*', **headers):
+        return self.client.get(path, HTTP_ACCEPT=accept, **headers)
+
+    def test_scaled_to_fit(self):
+        response = self.fetch('/img/160x160/products/a.jpg', accept='image/jpeg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as img:
+            self.assertEqual(img.size, (160, 80))
+
+    def test_format_follows_accept(self):
+        self.assertEqual(self.fetch('/img/160x160/products/a.jpg')['Content-Type'], 'image/webp')
+        response = self.fetch('/img/160x160/products/a.jpg', accept='image/webp;q=0,*/*')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('Accept', response['Vary'])
+
+    def test_revalidated_not_immutable(self):
+        response = self.fetch('/img/160x160/products/a.jpg')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+        etag = response['ETag']
+        response = self.fetch('/img/160x160/products/a.jpg', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_reused_path_gets_new_etag(self):
+        etag = self.fetch('/img/160x160/products/a.jpg')['ETag']
+        default_storage.delete('products/a.jpg')
+        image_resize.discard('products/a.jpg')
+        self.store('products/a.jpg', 'JPEG', (200, 400))
+        # Stored a while later: the version is the second it was written.
+        later = time.time() + 60
+        os.utime(default_storage.path('products/a.jpg'), (later, later))
+        response = self.fetch('/img/160x160/products/a.jpg', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_found(self):
+        for path in (
+            '/img/320x320/products/a.jpg',  # size not listed
+            '/img/160x160/products/missing.jpg',
+            '/img/160x160/products/a.txt',
+        ):
+            self.assertEqual(self.fetch(path).status_code, 404, path)
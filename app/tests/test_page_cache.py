@@ -0,0 +1,192 @@
+import re
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import _unmask_cipher_token
+from django.test import Client, RequestFactory, override_settings
+
+from app import cache as cache_module
+from app.cache import CATALOG, CSRF_PLACEHOLDER, NAV, cached_response, get_versions
+from app.context_processors import NAV_DESCRIPTION_LENGTH, get_navigation
+from app.models import BlogCategory, PageSEO, Product, ProductCategory
+from app.tests.base import CacheTestCase, make_post, make_product
+
+
+class NavScopeTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.capsules = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        self.tablets = ProductCategory.objects.create(name='Tablets', slug='tablets')
+        self.product = make_product(self.capsules)
+
+    def counts(self):
+        return {c['slug']: c['product_count'] for c in get_navigation()}
+
+    def test_product_edit_keeps_nav_pages(self):
+        etag = self.client.get('/about/')['ETag']
+        nav, catalog = get_versions([NAV, CATALOG])
+        self.product.description = '<p>Typo fixed.</p>'
+        self.product.save()
+        self.assertEqual(get_versions([NAV, CATALOG])[0], nav)
+        self.assertNotEqual(get_versions([NAV, CATALOG])[1], catalog)
+        self.assertEqual(self.client.get('/about/')['ETag'], etag)
+
+    def test_product_move_updates_menu(self):
+        self.assertEqual(self.counts(), {'capsules': 1, 'tablets': 0})
+        etag = self.client.get('/about/')['ETag']
+        self.product.category = self.tablets
+        self.product.save()
+        self.assertEqual(self.counts(), {'capsules': 0, 'tablets': 1})
+        self.assertNotEqual(self.client.get('/about/')['ETag'], etag)
+
+    def test_product_create_and_delete_update_menu(self):
+        other = make_product(self.tablets, 'Other')
+        self.assertEqual(self.counts(), {'capsules': 1, 'tablets': 1})
+        other.delete()
+        self.assertEqual(self.counts(), {'capsules': 1, 'tablets': 0})
+
+    def test_category_rename_updates_menu(self):
+        get_navigation()
+        self.tablets.name = 'Soft tablets'
+        self.tablets.save()
+        self.assertIn('Soft tablets', [c['name'] for c in get_navigation()])
+
+    def test_menu_keeps_short_plain_descriptions(self):
+        self.capsules.description = '<h1>Capsules</h1>' + '<p>Hard and soft gelatin.</p>' * 50
+        self.capsules.save()
+        [capsules] = [c for c in get_navigation() if c['slug'] == 'capsules']
+        self.assertTrue(capsules['description'].startswith('CapsulesHard and soft gelatin.'))
+        self.assertNotIn('<', capsules['description'])
+        self.assertLessEqual(len(capsules['description']), NAV_DESCRIPTION_LENGTH + len('...'))
+
+
+class VersionedInvalidationTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        self.product = make_product(self.category, 'Omeprazole')
+        self.url = f'/products/capsules/{self.product.slug}/'
+
+    def test_page_cached_until_saved(self):
+        self.assertContains(self.client.get(self.url), 'Omeprazole')
+        # A change that bypasses save() and its signals isn't seen...
+        Product.objects.filter(pk=self.product.pk).update(name='Pantoprazole')
+        self.assertNotContains(self.client.get(self.url), 'Pantoprazole')
+        # ...until the product is saved.
+        self.product.refresh_from_db()
+        self.product.save()
+        self.assertContains(self.client.get(self.url), 'Pantoprazole')
+
+    def test_delete_drops_cached_listing(self):
+        self.assertContains(self.client.get('/products/capsules/'), 'Omeprazole')
+        self.product.delete()
+        self.assertNotContains(self.client.get('/products/capsules/'), 'Omeprazole')
+
+    def test_other_scopes_keep_their_pages(self):
+        etag = self.client.get(self.url)['ETag']
+        make_post(BlogCategory.objects.create(name='News', slug='news'))
+        PageSEO.objects.create(title='About', slug='about', content1='<p>About us.</p>')
+        self.assertEqual(self.client.get(self.url)['ETag'], etag)
+
+    def test_page_seo_bumps_its_page_only(self):
+        about, contact = self.client.get('/about/')['ETag'], self.client.get('/contact/')['ETag']
+        PageSEO.objects.create(title='About', slug='about', content1='<p>About us.</p>')
+        self.assertNotEqual(self.client.get('/about/')['ETag'], about)
+        self.assertEqual(self.client.get('/contact/')['ETag'], contact)
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.product.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(PAGE_CACHE_GRACE=60, PAGE_CACHE_LOCK_TIMEOUT=30, PAGE_CACHE_MISS_WAIT=0.2)
+class StaleWhileRevalidateTests(CacheTestCase):
+    key = 'pagecache.page.test'
+
+    def setUp(self):
+        super().setUp()
+        self.renders = 0
+
+    def render(self):
+        self.renders += 1
+        return HttpResponse(f'render {self.renders}')
+
+    def get(self, timeout=60):
+        response, _ = cached_response(RequestFactory().get('/'), self.key, timeout, self.render)
+        return response.content.decode()
+
+    def test_hit_does_not_render(self):
+        self.assertEqual(self.get(), 'render 1')
+        self.assertEqual(self.get(), 'render 1')
+        self.assertEqual(self.renders, 1)
+
+    def test_stale_served_while_another_request_renders(self):
+        self.get(timeout=-1)
+        # Another worker is regenerating it.
+        cache.add(self.key + '.lock', 1)
+        self.assertEqual(self.get(), 'render 1')
+        self.assertEqual(self.renders, 1)
+
+    def test_stale_refreshed_by_one_request(self):
+        self.get(timeout=-1)
+        self.assertEqual(self.get(), 'render 2')
+        self.assertIsNone(cache.get(self.key + '.lock'))
+        self.assertEqual(self.get(), 'render 2')
+
+    def test_miss_waits_for_lock_holder(self):
+        cache.add(self.key + '.lock', 1)
+
+        def store():
+            time.sleep(0.05)
+            cache.set(self.key, (HttpResponse('rendered elsewhere'), time.time() + 60, {}))
+
+        thread = threading.Thread(target=store)
+        thread.start()
+        self.assertEqual(self.get(), 'rendered elsewhere')
+        thread.join()
+        self.assertEqual(self.renders, 0)
+
+    def test_miss_renders_after_waiting_in_vain(self):
+        cache.add(self.key + '.lock', 1)
+        self.assertEqual(self.get(), 'render 1')
+
+    def test_uncacheable_response_releases_lock(self):
+        self.render = lambda: HttpResponse('not found', status=404)
+        self.get()
+        self.assertIsNone(cache.get(self.key + '.lock'))
+        self.assertIsNone(cache.get(self.key))
+
+
+class CsrfPlaceholderTests(CacheTestCase):
+    def token(self, response):
+        match = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"', response.content)
+        return match.group(1).decode()
+
+    def test_each_visitor_gets_own_token(self):
+        tokens = []
+        for _ in range(2):
+            client = Client()
+            response = client.get('/enquiry/')
+            self.assertNotContains(response, CSRF_PLACEHOLDER)
+            token = self.token(response)
+            # The token in the form goes with this visitor's cookie.
+            self.assertEqual(_unmask_cipher_token(token), client.cookies['csrftoken'].value)
+            self.assertIn('Cookie', response['Vary'])
+            tokens.append(token)
+        self.assertNotEqual(tokens[0], tokens[1])
+
+    def test_cookies_share_the_cached_page(self):
+        with mock.patch.object(cache_module.page_cache_stats, 'record') as record:
+            self.client.get('/about/')
+            self.client.get('/about/', HTTP_COOKIE='_ga=GA1.2.3; theme=dark')
+        self.assertEqual([call.args[0] for call in record.call_args_list], ['miss', 'hit'])
+
+    @override_settings(EDGE_CACHE_TIMEOUT=3600)
+    def test_token_pages_kept_from_cdn(self):
+        self.assertNotIn('s-maxage', self.client.get('/enquiry/')['Cache-Control'])
+        self.assertIn('s-maxage=3600', self.client.get('/about/')['Cache-Control'])
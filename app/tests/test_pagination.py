@@ -0,0 +1,103 @@
+import datetime
+
+from django.test import override_settings
+from django.utils import timezone
+
+from app.models import BlogCategory, BlogPost, Product, ProductCategory
+from app.pagination import encode_cursor
+from app.tests.base import CacheTestCase
+
+
+class KeysetPaginationTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        # Names tie, so only the id tells rows apart.
+        cls.product_ids = [
+            Product.objects.create(
+                name='Same' if i % 3 else 'Other', slug=f'product-{i}', sku=f'SKU{i}',
+                category=category, image='products/x.jpg',
+            ).pk
+            for i in range(10)
+        ]
+        blog_category = BlogCategory.objects.create(name='News', slug='news')
+        published = timezone.make_aware(datetime.datetime(2024, 5, 1, 12, 0))
+        cls.post_ids = [
+            BlogPost.objects.create(
+                title=f'Post {i}', slug=f'post-{i}', excerpt='', content='',
+                category=blog_category, author='Arivas', published_date=published,
+                status='published',
+            ).pk
+            for i in range(7)
+        ]
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), 3)
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return ids
+
+    def test_every_product_once(self):
+        ids = self.walk('/api/products/?limit=3')
+        self.assertEqual(sorted(ids), sorted(self.product_ids))
+
+    def test_every_product_once_with_fields(self):
+        ids = self.walk('/api/products/?limit=3&fields=id,name')
+        self.assertEqual(sorted(ids), sorted(self.product_ids))
+
+    def test_every_blog_post_once(self):
+        ids = self.walk('/api/blog-posts/?limit=3')
+        # Newest first, then by id descending among posts published together.
+        self.assertEqual(ids, sorted(self.post_ids, reverse=True))
+
+    def test_bad_cursor(self):
+        for cursor in ('not-base64!', 'bm90IGpzb24', 'WzFd'):
+            response = self.client.get('/api/products/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn('error', response.json())
+
+    def test_tampered_cursor(self):
+        # Well-formed cursors holding values of the wrong type.
+        for url, values in (
+            ('/api/products/', ['a', 'b']),
+            ('/api/products/', ['a', None]),
+            ('/api/products/', ['a', ['b']]),
+            ('/api/blog-posts/', ['yesterday', 1]),
+            ('/api/blog-posts/', [12, 1]),
+        ):
+            response = self.client.get(url, {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, (url, values))
+            self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_products_page_with_tampered_cursor(self):
+        # The server-rendered /products/ pages through the same cursors.
+        response = self.client.get('/products/', {'cursor': encode_cursor(['a', 'b'])})
+        self.assertEqual(response.status_code, 404)
+
+    def test_products_page_next_link(self):
+        response = self.client.get('/products/', {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        next_url = response.context['next_page']
+        self.assertEqual(self.client.get(next_url).status_code, 200)
+
+    def test_bad_limit(self):
+        for limit in ('0', '-1', 'ten'):
+            response = self.client.get('/api/products/', {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+
+    @override_settings(API_MAX_PAGE_SIZE=4)
+    def test_limit_capped(self):
+        response = self.client.get('/api/products/', {'limit': 1000})
+        data = response.json()
+        self.assertEqual(len(data['results']), 4)
+        self.assertIsNotNone(data['next'])
+
+    @override_settings(API_PAGE_SIZE=2)
+    def test_default_limit(self):
+        response = self.client.get('/api/blog-posts/')
+        self.assertEqual(len(response.json()['results']), 2)
@@ -0,0 +1,109 @@
+from django.contrib import admin
+
+from app import search
+from app.admin import EnquiryAdmin
+from app.models import BlogCategory, Enquiry, ProductCategory
+from app.tests.base import CacheTestCase, make_post, make_product
+
+
+def make_enquiry(**fields):
+    return Enquiry.objects.create(**{
+        'name': 'Asha Rao', 'email': 'asha@example.com', 'subject': 'Bulk order',
+        'message': 'Please quote for omeprazole capsules.', 'ip_address': '127.0.0.1',
+        **fields,
+    })
+
+
+class EnquirySearchTests(CacheTestCase):
+    def admin_search(self, term):
+        results, _ = EnquiryAdmin(Enquiry, admin.site).get_search_results(
+            None, Enquiry.objects.all(), term
+        )
+        return set(results)
+
+    def test_admin_search_finds_message_words(self):
+        enquiry = make_enquiry()
+        other = make_enquiry(name='Ravi', email='ravi@example.com', message='Tablets price list?')
+        self.assertEqual(self.admin_search('omepraz'), {enquiry})
+        self.assertEqual(self.admin_search('bulk order'), {enquiry, other})
+        self.assertEqual(self.admin_search('ravi'), {other})
+
+    def test_deleted_enquiry_leaves_index(self):
+        enquiry = make_enquiry()
+        enquiry.delete()
+        self.assertEqual(self.admin_search('omeprazole'), set())
+
+    def test_rebuild_includes_enquiries(self):
+        enquiry = make_enquiry()
+        search.rebuild()
+        self.assertEqual(self.admin_search('omeprazole'), {enquiry})
+
+    def test_enquiries_stay_out_of_public_search(self):
+        make_enquiry()
+        self.assertEqual(search.search('omeprazole'), [])
+        response = self.client.get('/api/search/', {'q': 'asha'})
+        self.assertEqual(response.json()['results'], [])
+
+
+class SearchApiTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.capsules = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        self.omeprazole = make_product(
+            self.capsules, 'Omeprazole 20', sku='OME-20', description='<p>Gastro-resistant.</p>'
+        )
+        # Mentions omeprazole in its text only, so it ranks below.
+        self.combo = make_product(self.capsules, 'Acid Combo', description='<p>With omeprazole.</p>')
+        news = BlogCategory.objects.create(name='News', slug='news')
+        self.post = make_post(news, 'Omeprazole explained')
+        self.draft = make_post(news, 'Omeprazole draft', status='draft')
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def hits(self, **params):
+        return [(result['type'], result['item']['id']) for result in self.search(**params)['results']]
+
+    def test_ranked_products_and_published_posts(self):
+        hits = self.hits(q='omeprazole')
+        self.assertEqual(set(hits), {
+            ('product', self.omeprazole.pk), ('product', self.combo.pk), ('blogpost', self.post.pk),
+        })
+        self.assertLess(hits.index(('product', self.omeprazole.pk)), hits.index(('product', self.combo.pk)))
+
+    def test_last_word_is_a_prefix(self):
+        self.assertEqual(self.hits(q='gastro resis'), [('product', self.omeprazole.pk)])
+        self.assertEqual(self.hits(q='ome-2', type='product')[0], ('product', self.omeprazole.pk))
+
+    def test_type_and_paging(self):
+        first = self.search(q='omeprazole', type='product', limit=1)
+        self.assertEqual(len(first['results']), 1)
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        ids = {r['item']['id'] for r in first['results'] + second['results']}
+        self.assertEqual(ids, {self.omeprazole.pk, self.combo.pk})
+
+    def test_index_follows_saves(self):
+        self.omeprazole.name = 'Esomeprazole 40'
+        self.omeprazole.save()
+        self.assertIn(('product', self.omeprazole.pk), self.hits(q='esomeprazole'))
+        self.capsules.name = 'Softgels'
+        self.capsules.save()
+        self.assertEqual(len(self.hits(q='softgels')), 2)
+        self.combo.delete()
+        self.assertEqual(self.hits(q='combo'), [])
+
+    def test_products_api_filter(self):
+        response = self.client.get('/api/products/', {'q': 'gastro', 'fields': 'id'})
+        self.assertEqual(response.json()['results'], [{'id': self.omeprazole.pk}])
+
+    def test_bad_queries(self):
+        for params in ({}, {'q': '  ,; '}, {'q': 'omeprazole', 'type': 'page'}):
+            response = self.client.get('/api/search/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.hits(q='"omeprazole" OR NEAR(*'), [])
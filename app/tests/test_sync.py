@@ -0,0 +1,109 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from app.models import BlogCategory, BlogPost, Product, ProductCategory
+from app.tests.base import CacheTestCase, make_post, make_product
+
+
+class DeltaSyncTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = ProductCategory.objects.create(name='Capsules', slug='capsules')
+        self.other_category = ProductCategory.objects.create(name='Tablets', slug='tablets')
+        self.products = [
+            make_product(self.category if i < 3 else self.other_category, f'Product {i}')
+            for i in range(5)
+        ]
+        blog_category = BlogCategory.objects.create(name='News', slug='news')
+        self.posts = [make_post(blog_category, f'Post {i}') for i in range(3)]
+        # Everything above was last saved two days ago; clients synced since.
+        old = timezone.now() - datetime.timedelta(days=2)
+        for model in (ProductCategory, Product, BlogCategory, BlogPost):
+            model.objects.update(updated_at=old)
+        self.since = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+
+    def sync(self, url, **params):
+        response = self.client.get(url, {'since': self.since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_nothing_changed(self):
+        data = self.sync('/api/products/')
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['deleted'], {'products': [], 'categories': []})
+        self.assertIn('since', data)
+
+    def test_edit_after_since(self):
+        edited = self.products[1]
+        edited.name = 'Renamed'
+        edited.save()
+        data = self.sync('/api/products/')
+        self.assertEqual([item['id'] for item in data['results']], [edited.pk])
+        self.assertEqual(data['results'][0]['name'], 'Renamed')
+
+    def test_category_edit_returns_its_products(self):
+        self.other_category.name = 'Soft tablets'
+        self.other_category.save()
+        data = self.sync('/api/products/')
+        self.assertEqual(
+            sorted(item['id'] for item in data['results']),
+            sorted(p.pk for p in self.products[3:]),
+        )
+
+    def test_deletion_tombstone(self):
+        deleted = self.products[0]
+        pk = deleted.pk
+        deleted.delete()
+        data = self.sync('/api/products/')
+        self.assertEqual(data['deleted']['products'], [pk])
+        self.assertNotIn(pk, [item['id'] for item in data['results']])
+
+    def test_deleted_category_tombstone(self):
+        pk = self.other_category.pk
+        self.other_category.delete()
+        data = self.sync('/api/products/')
+        self.assertEqual(data['deleted']['categories'], [pk])
+        # Its products went with it.
+        self.assertEqual(data['deleted']['products'], sorted(p.pk for p in self.products[3:]))
+
+    def test_unpublished_post_tombstone(self):
+        post = self.posts[0]
+        post.status = 'draft'
+        post.save()
+        data = self.sync('/api/blog-posts/')
+        self.assertEqual(data['deleted']['posts'], [post.pk])
+        self.assertEqual(data['results'], [])
+
+    def test_only_first_page_has_tombstones(self):
+        for product in self.products:
+            product.save()
+        self.products[0].delete()
+        data = self.sync('/api/products/', limit=2)
+        self.assertIn('deleted', data)
+        response = self.client.get(data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('deleted', response.json())
+
+    def test_unix_timestamp(self):
+        self.products[2].save()
+        since = (timezone.now() - datetime.timedelta(days=1)).timestamp()
+        response = self.client.get('/api/products/', {'since': str(since)})
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.products[2].pk])
+
+    def test_bad_since(self):
+        too_old = (timezone.now() - datetime.timedelta(days=365)).isoformat()
+        for since in ('yesterday', '1e30', too_old):
+            response = self.client.get('/api/products/', {'since': since})
+            self.assertEqual(response.status_code, 400, since)
+            self.assertIn('error', response.json())
+
+    def test_backfill_counts_as_a_change(self):
+        # As after a raw SQL import that bypassed save().
+        changed = self.products[2]
+        Product.objects.filter(pk=changed.pk).update(description='<p>Imported.</p>')
+        call_command('backfill_plain_text', stdout=StringIO())
+        data = self.sync('/api/products/')
+        self.assertEqual([item['id'] for item in data['results']], [changed.pk])
@@ -1,11 +1,16 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET
+from django.urls import reverse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET, require_http_methods
 from django.views.decorators.csrf import csrf_protect, csrf_exempt
 from django.core import serializers
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.db.models import Count, Q
 from datetime import datetime, timedelta
+import json
+from functools import lru_cache
 from .models import (
     ProductCategory, Product, ProductStatus, BlogPost, BlogCategory, 
     PriceList, ContactFormSubmission, PageSEO, Enquiry
@@ -14,8 +19,29 @@ from .models import (
 from django.template import Template, Context
 from django.template.loader import get_template
 from django.utils.safestring import mark_safe
-from django.views.decorators.cache import cache_page
-from django.utils.html import strip_tags
+
+from . import autocomplete, cdn, image_resize, search, snapshots, sync
+from .cache import (
+    NAV, CATALOG, BLOG, PRICE_LIST, page_scope, conditional_page, versioned_cache_page
+)
+from .cdn import cache_tags
+from .context_processors import get_navigation
+from .pagination import (
+    InvalidQuery, columns_for, decode_cursor, get_fields, get_limit, keyset_page, next_page_url,
+    render_item, serialize
+)
+from .snapshots import BLOG_POST_FIELDS, PRODUCT_FIELDS
+from .streaming import StreamingJsonResponse, encode_items
+
+PAGE_CACHE_TIMEOUT = settings.PAGE_CACHE_TIMEOUT
+API_CACHE_TIMEOUT = settings.API_CACHE_TIMEOUT
+
+@lru_cache(maxsize=settings.DYNAMIC_TEMPLATE_CACHE_SIZE)
+def compile_dynamic_content(content):
+    # Keyed by the content itself, so editing a page compiles the new
+    # version and the old one falls out of the LRU.
+    template_string = "{% load custom_filters %}" + content
+    return Template(template_string)
 
 def render_dynamic_content(content, context_dict=None):
     if not content:
@@ -23,16 +49,13 @@ def render_dynamic_content(content, context_dict=None):
     if context_dict is None:
         context_dict = {}
     
-    # Create a template string that loads the custom filters
-    template_string = "{% load custom_filters %}" + content
-    template = Template(template_string)
+    template = compile_dynamic_content(content)
     context = Context(context_dict)
     return mark_safe(template.render(context))
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, CATALOG, page_scope('home')])
+@cache_tags(cdn.NAV, cdn.CATALOG, cdn.page_tag('home'))
 def home(request):
-    # Prefetch related data to reduce queries
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
     page_content = PageSEO.objects.filter(slug='home').first()
     
     try:
@@ -61,11 +84,11 @@ def home(request):
 
     # Use select_related for category and limit fields if possible
     new_products = Product.objects.select_related('category').only(
-        'id', 'name', 'slug', 'description', 'image', 'created_at', 'category__name', 'category__slug'
+        'id', 'name', 'slug', 'description_first_sentence', 'image', 'image_derivatives', 'created_at',
+        'category__name', 'category__slug'
     ).order_by('-created_at')[:12]
 
     return render(request, 'pages/home.html', {
-        'product_categories': product_categories,
         'new_products': new_products,
         'best_selling_products': best_selling_products,
         'seo_meta_title': seo_meta_title,
@@ -78,17 +101,16 @@ def home(request):
         'content5': content5,
     })
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, page_scope('about')])
+@cache_tags(cdn.NAV, cdn.page_tag('about'))
 def about(request):
-    # Use select_related/prefetch_related to optimize queries
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
     page_content = PageSEO.objects.filter(slug='about').first()
     
     if page_content:
         rendered_page_content = render_dynamic_content(
             page_content.content1 if page_content.content1 else "",
             {
-                "product_categories": product_categories,
+                "product_categories": get_navigation(),
             }
         )
         seo_meta_title = page_content.seo_meta_title or "About"
@@ -101,14 +123,14 @@ def about(request):
         seo_meta_keywords = ""
         
     return render(request, 'pages/about.html', {
-        'product_categories': product_categories,
         'seo_meta_title': seo_meta_title,
         'seo_meta_description': seo_meta_description,
         'seo_meta_keywords': seo_meta_keywords,
         'rendered_page_content': rendered_page_content,
     })
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, page_scope('contact')])
+@cache_tags(cdn.NAV, cdn.page_tag('contact'))
 @csrf_exempt
 def contact(request):
     if request.method == 'POST':
@@ -155,8 +177,6 @@ def contact(request):
             })
 
     # GET request - show contact page
-    # Use select_related/prefetch_related to optimize queries
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
     page_content = PageSEO.objects.filter(slug='contact').first()
     
     # Initialize variables
@@ -164,7 +184,7 @@ def contact(request):
         rendered_page_content = render_dynamic_content(
             page_content.content1 if page_content.content1 else "",
             {
-                "product_categories": product_categories,
+                "product_categories": get_navigation(),
             }
         )
         seo_meta_title = page_content.seo_meta_title or "Contact Us"
@@ -177,7 +197,6 @@ def contact(request):
         seo_meta_keywords = "contact arivas pharma, pharmaceutical company contact, healthcare contact, medicine inquiry"
     
     return render(request, 'pages/contact.html', {
-        'product_categories': product_categories,
         'seo_meta_title': seo_meta_title,
         'seo_meta_description': seo_meta_description,
         'seo_meta_keywords': seo_meta_keywords,
@@ -185,7 +204,8 @@ def contact(request):
     })
 
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, CATALOG, page_scope('enquiry')])
+@cache_tags(cdn.NAV, cdn.CATALOG, cdn.page_tag('enquiry'))
 @csrf_exempt
 def enquiry(request):
     if request.method == 'POST':
@@ -235,8 +255,6 @@ def enquiry(request):
             })
     
     # GET request - show enquiry page
-    # Use select_related/prefetch_related to optimize queries
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
     page_content = PageSEO.objects.filter(slug='enquiry').first()
     
     # Initialize variables
@@ -244,7 +262,7 @@ def enquiry(request):
         rendered_page_content = render_dynamic_content(
             page_content.content1 if page_content.content1 else "",
             {
-                "product_categories": product_categories,
+                "product_categories": get_navigation(),
             }
         )
         seo_meta_title = page_content.seo_meta_title or "Enquiry Form"
@@ -267,11 +285,10 @@ def enquiry(request):
     
     # Get latest products for sidebar with optimized query
     latest_products = Product.objects.select_related('category').only(
-        'id', 'name', 'slug', 'description', 'image', 'created_at', 'category__name', 'category__slug'
+        'id', 'name', 'sku', 'slug', 'description_text', 'image', 'created_at', 'category__name', 'category__slug'
     ).order_by('-created_at')[:6]
     
     context = {
-        'product_categories': product_categories,
         'prefilled_sku': sku,
         'latest_products': latest_products,
         'seo_meta_title': seo_meta_title,
@@ -287,17 +304,37 @@ def enquiry(request):
     
     return render(request, 'pages/enquiry.html', context)
 
-# @cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, CATALOG, page_scope('products')])
+@cache_tags(cdn.NAV, cdn.CATALOG, cdn.page_tag('products'))
 def products(request):
-    # Use select_related/prefetch_related to optimize queries
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
-    
-    # Optimize products query with select_related and only necessary fields
-    products = Product.objects.select_related('category', 'status').only(
-        'id', 'name', 'slug', 'description', 'image', 'created_at', 
-        'category__name', 'category__slug', 'status__name'
-    ).order_by('-created_at')
-    
+    """
+    The first page of products (or the page in ``?cursor=``), rendered on
+    the server with the ``api_products`` filters and a link to the next
+    page. The same page is embedded as JSON for the client-side filters,
+    which continue from it through the API.
+    """
+    try:
+        products, _ = _products_for_api(request, list(PRODUCT_FIELDS))
+        if settings.STATIC_EXPORT:
+            # A static host ignores ?cursor=, so the exported page lists them all.
+            page, next_url = list(products.order_by(*[field for field, _ in PRODUCT_ORDERING])), None
+        else:
+            page, next_url = keyset_page(request, products, PRODUCT_ORDERING)
+    except InvalidQuery:
+        raise Http404('Invalid page')
+    items = [json.loads(snapshots.fragment(product)) for product in page]
+
+    categories = [
+        {'id': category['id'], 'name': category['name'], 'slug': category['slug']}
+        for category in get_navigation()
+    ]
+    selected = request.GET.get('category', '')
+    selected_category = next(
+        (str(c['id']) for c in categories if selected in (str(c['id']), c['slug'])), ''
+    )
+    # The client asks the API for the pages after this one.
+    api_next = f"{reverse('api_products')}?{next_url.split('?', 1)[1]}" if next_url else None
+
     page_content = PageSEO.objects.filter(slug='products').first()
     
     if page_content:
@@ -310,46 +347,53 @@ def products(request):
         seo_meta_keywords = "Products, Pharmaceuticals, Healthcare"
     
     return render(request, 'pages/products.html', {
-        'product_categories': product_categories,
-        'products': products,
+        'products': items,
+        'categories': categories,
+        'selected_category': selected_category,
+        'search': request.GET.get('q', ''),
+        'next_page': next_url,
+        'first_page': request.path if request.GET.get('cursor') else None,
+        'initial_state': {
+            'products': items,
+            'next': api_next,
+            'categories': categories,
+            'selectedCategory': selected_category,
+            'search': request.GET.get('q', ''),
+        },
         'seo_meta_title': seo_meta_title,
         'seo_meta_description': seo_meta_description,
         'seo_meta_keywords': seo_meta_keywords,
     })
 
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, CATALOG])
+@cache_tags(cdn.NAV, cdn.CATALOG)
 def category_products(request, category_slug):
-    # Optimize product_categories query with prefetch_related
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
-    
     # Use get_object_or_404 for better error handling and optimize with select_related
     category = get_object_or_404(ProductCategory.objects.select_related(), slug=category_slug)
     
     # Optimize products query with select_related and only necessary fields
     products = Product.objects.select_related('category', 'status').only(
-        'id', 'name', 'slug', 'description', 'image', 'created_at',
+        'id', 'name', 'slug', 'description', 'description_text', 'image', 'image_derivatives', 'created_at',
         'category__name', 'category__slug', 'status__name'
     ).filter(category=category).order_by('-created_at')
     
     seo_meta_title = category.seo_meta_title or category.name
-    seo_meta_description = category.seo_meta_description or category.description
+    seo_meta_description = category.seo_meta_description or category.description_text
     seo_meta_keywords = ', '.join(category.get_seo_keywords_list()) if category else "Default, Keywords"
     
-    return render(request, 'pages/category_products.html', {
-        'product_categories': product_categories,
+    response = render(request, 'pages/category_products.html', {
         'products': products,
         'category': category,
         'seo_meta_title': seo_meta_title,
         'seo_meta_description': seo_meta_description,
         'seo_meta_keywords': seo_meta_keywords,
     })
+    return cdn.add_cache_tags(response, cdn.category_tag(category.slug))
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, CATALOG])
+@cache_tags(cdn.NAV)
 def product_in_category(request, category_slug, product_slug):
-    # Optimize product_categories query with select_related and prefetch_related
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
-    
     # Use get_object_or_404 for better error handling and optimize with select_related
     product = get_object_or_404(
         Product.objects.select_related('category', 'status'),
@@ -358,26 +402,26 @@ def product_in_category(request, category_slug, product_slug):
     )
     
     seo_meta_title = product.seo_meta_title or product.name
-    seo_meta_description = product.seo_meta_description or product.description
+    seo_meta_description = product.seo_meta_description or product.description_text
     seo_meta_keywords = product.seo_meta_keywords or ''
     
-    return render(request, 'pages/individual_products.html', {
-        'product_categories': product_categories,
+    response = render(request, 'pages/individual_products.html', {
         'product': product,
         'seo_meta_title': seo_meta_title,
         'seo_meta_description': seo_meta_description,
         'seo_meta_keywords': seo_meta_keywords,
     })
+    return cdn.add_cache_tags(
+        response, cdn.product_tag(product.pk), cdn.category_tag(product.category.slug)
+    )
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, BLOG, page_scope('blog')])
+@cache_tags(cdn.NAV, cdn.BLOG, cdn.page_tag('blog'))
 def blog(request):
-    # Optimize product_categories query with select_related and prefetch_related
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
-    
     # Optimize blog_posts query with select_related and only necessary fields
     blog_posts = BlogPost.objects.select_related('category').only(
         'id', 'title', 'slug', 'excerpt', 'author', 'published_date', 
-        'is_featured', 'featured_image', 'category__name', 'category__slug'
+        'is_featured', 'featured_image', 'featured_image_derivatives', 'category__name', 'category__slug'
     ).filter(status='published').order_by('-published_date')
     
     # Only fetch necessary fields for blog_categories
@@ -390,7 +434,6 @@ def blog(request):
     seo_meta_keywords = ', '.join(page_content.get_seo_keywords_list()) if page_content else "Blog, Articles, News"
 
     return render(request, 'pages/blog.html', {
-        'product_categories': product_categories,
         'blog_posts': blog_posts,
         'blog_categories': blog_categories,
         'seo_meta_title': seo_meta_title,
@@ -398,11 +441,9 @@ def blog(request):
         'seo_meta_keywords': seo_meta_keywords,
     })
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, BLOG])
+@cache_tags(cdn.NAV, cdn.BLOG)
 def individual_blog(request, slug):
-    # Optimize product_categories query with select_related and prefetch_related
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
-    
     # Use get_object_or_404 with select_related for better performance
     post = get_object_or_404(
         BlogPost.objects.select_related('category'),
@@ -412,7 +453,7 @@ def individual_blog(request, slug):
     
     # Get related posts from the same category with optimized query
     related_posts = BlogPost.objects.select_related('category').only(
-        'id', 'title', 'slug', 'excerpt', 'published_date', 'featured_image',
+        'id', 'title', 'slug', 'excerpt', 'published_date', 'featured_image', 'featured_image_derivatives',
         'category__name', 'category__slug'
     ).filter(
         category=post.category, 
@@ -424,7 +465,6 @@ def individual_blog(request, slug):
     seo_meta_keywords = post.seo_meta_keywords or ', '.join(post.get_tags_list()) if hasattr(post, 'get_tags_list') else ''
     
     return render(request, 'pages/individual_blog.html', {
-        'product_categories': product_categories,
         'post': post,
         'related_posts': related_posts,
         'seo_meta_title': seo_meta_title,
@@ -432,18 +472,16 @@ def individual_blog(request, slug):
         'seo_meta_keywords': seo_meta_keywords,
     })
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, BLOG])
+@cache_tags(cdn.NAV, cdn.BLOG)
 def blog_category(request, category_slug):
-    # Optimize product_categories query with select_related and prefetch_related
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
-    
     # Use get_object_or_404 with optimized query
     blog_category = get_object_or_404(BlogCategory.objects.only('id', 'name', 'slug'), slug=category_slug)
     
     # Optimize blog_posts query with select_related and only necessary fields
     blog_posts = BlogPost.objects.select_related('category').only(
         'id', 'title', 'slug', 'excerpt', 'author', 'published_date', 
-        'is_featured', 'featured_image', 'category__name', 'category__slug'
+        'is_featured', 'featured_image', 'featured_image_derivatives', 'category__name', 'category__slug'
     ).filter(
         category=blog_category, 
         status='published'
@@ -457,7 +495,6 @@ def blog_category(request, category_slug):
     seo_meta_keywords = f"{blog_category.name}, blog, articles"
     
     return render(request, 'pages/blog.html', {
-        'product_categories': product_categories,
         'blog_posts': blog_posts,
         'blog_categories': blog_categories,
         'selected_category': blog_category,
@@ -466,11 +503,9 @@ def blog_category(request, category_slug):
         'seo_meta_keywords': seo_meta_keywords,
     })
 
-@cache_page(60 * 15)  # Cache for 15 minutes
+@versioned_cache_page(PAGE_CACHE_TIMEOUT, [NAV, PRICE_LIST, page_scope('price-list')])
+@cache_tags(cdn.NAV, cdn.PRICE_LIST, cdn.page_tag('price-list'))
 def price_list(request):
-    # Optimize product_categories query with select_related and prefetch_related
-    product_categories = ProductCategory.objects.select_related().prefetch_related('products')
-    
     # Get the active price list with optimized query
     price_list = PriceList.objects.only(
         'id', 'title', 'description', 'pdf_file', 'is_active'
@@ -483,96 +518,360 @@ def price_list(request):
     seo_meta_keywords = ', '.join(page_content.get_seo_keywords_list()) if page_content else "price list, pharmaceutical prices, medicine cost"
 
     return render(request, 'pages/price_list.html', {
-        'product_categories': product_categories,
         'price_list': price_list,
         'seo_meta_title': seo_meta_title,
         'seo_meta_description': seo_meta_description,
         'seo_meta_keywords': seo_meta_keywords,
     })
 
-@cache_page(60 * 5)  # Cache for 5 minutes for API
+def _filter_by_id_or_slug(queryset, field, value):
+    # Filters take either the id or the slug of the related row.
+    if value.isdigit():
+        return queryset.filter(**{f'{field}_id': int(value)})
+    return queryset.filter(**{f'{field}__slug': value})
+
+
+PRODUCT_ORDERING = [('name', False), ('id', False)]
+
+def _products_with_fields(fields, extra_columns=()):
+    """
+    All products, loading only what ``fields`` (and ``extra_columns``) need,
+    and whether every field was requested, in which case only the stored
+    JSON is loaded.
+    """
+    whole = len(fields) == len(PRODUCT_FIELDS)
+    if whole:
+        products = Product.objects.only('api_json', *extra_columns, *columns_for([], PRODUCT_FIELDS, PRODUCT_ORDERING))
+    else:
+        products = Product.objects.only(*extra_columns, *columns_for(fields, PRODUCT_FIELDS, PRODUCT_ORDERING))
+        if 'category' in fields:
+            products = products.select_related('category')
+    return products, whole
+
+def _products_for_api(request, fields, since=None):
+    """
+    Products matching the API filters (and changed since ``since``, if
+    given), loading only what ``fields`` needs. When every field is
+    requested only the stored JSON is loaded, and the second value returned
+    is True.
+    """
+    products, whole = _products_with_fields(fields)
+    if request.GET.get('category'):
+        products = _filter_by_id_or_slug(products, 'category', request.GET['category'])
+    if request.GET.get('status'):
+        products = _filter_by_id_or_slug(products, 'status', request.GET['status'])
+    matching = search.matching_ids(search.PRODUCT, request.GET.get('q', ''))
+    if matching is not None:
+        products = products.filter(pk__in=matching)
+    if since is not None:
+        products = sync.changed(products, since, ProductCategory)
+    return products, whole
+
+@versioned_cache_page(API_CACHE_TIMEOUT, [CATALOG])
+@cache_tags(cdn.CATALOG)
 @require_GET
 @csrf_exempt
 def api_products(request):
+    """
+    Products by name, a page at a time: ``?limit=``, ``?cursor=`` (from
+    ``next``), ``?category=`` and ``?status=`` (id or slug), ``?q=`` (words
+    in the name, SKU, category or text, via the search index) and ``?fields=``.
+    ``?since=`` lists only changes, with tombstones; see ``app/sync.py``.
+    """
     try:
-        # Optimize query with select_related and only necessary fields
-        products = Product.objects.select_related('category').only(
-            'id', 'name', 'slug', 'description', 'image',
-            'category__id', 'category__name', 'category__slug'
-        ).all()
-        
-        data = []
-        for p in products:
-            data.append({
-                'id': p.id,
-                'name': strip_tags(p.name),
-                'slug': p.slug,
-                'description': strip_tags(p.description)[:200] + '...' if len(strip_tags(p.description)) > 200 else strip_tags(p.description),
-                'image': p.image.url if p.image else '',
-                'category': {
-                    'id': p.category.id,
-                    'name': strip_tags(p.category.name),
-                    'slug': p.category.slug,
-                } if p.category else None,
-            })
-        return JsonResponse(data, safe=False)
+        fields = get_fields(request, PRODUCT_FIELDS)
+        since = sync.get_since(request)
+        products, whole = _products_for_api(request, fields, since)
+        page, next_url = keyset_page(request, products, PRODUCT_ORDERING)
+        extra = sync.first_page_extra(request, since, lambda: {
+            'products': sync.deleted_ids(Product, since),
+            'categories': sync.deleted_ids(ProductCategory, since),
+        })
+        if whole:
+            return HttpResponse(snapshots.page(page, next_url, extra), content_type='application/json')
+        return JsonResponse({'results': serialize(page, fields, PRODUCT_FIELDS), 'next': next_url, **extra})
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': 'Unable to fetch products'}, status=500)
+
+# Not page cached (the cache can't hold streamed responses), but answered
+# with a 304 while the catalog is unchanged and cacheable by the CDN.
+@conditional_page([CATALOG])
+@cache_tags(cdn.CATALOG)
+@require_GET
+@csrf_exempt
+def api_products_export(request):
+    """
+    Every product matching the ``api_products`` filters and ``?fields=``, as
+    one JSON array streamed in constant memory.
+    """
+    try:
+        fields = get_fields(request, PRODUCT_FIELDS)
+        products, whole = _products_for_api(request, fields)
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    products = products.order_by(*[field for field, _ in PRODUCT_ORDERING])
+    if whole:
+        return StreamingJsonResponse(encode_items(products, snapshots.fragment))
+    return StreamingJsonResponse(encode_items(products, lambda p: render_item(p, fields, PRODUCT_FIELDS)))
+
+# Lookup keys of the batch API -> the product field they match.
+BATCH_KEYS = {'ids': 'pk', 'skus': 'sku', 'slugs': 'slug'}
+
+def _batch_values(request):
+    """
+    The values to look up for each of ``BATCH_KEYS``: JSON lists in a POST
+    body, or comma-separated lists in the query string.
+    """
+    if request.method == 'POST':
+        try:
+            body = json.loads(request.body or b'{}')
+        except ValueError:
+            raise InvalidQuery('The request body must be a JSON object')
+        if not isinstance(body, dict):
+            raise InvalidQuery('The request body must be a JSON object')
+        lists = {key: body.get(key) or [] for key in BATCH_KEYS}
+        if not all(isinstance(values, list) for values in lists.values()):
+            raise InvalidQuery(f"{', '.join(BATCH_KEYS)} must be lists")
+    else:
+        lists = {key: request.GET.get(key, '').split(',') for key in BATCH_KEYS}
+    wanted = {}
+    for key, values in lists.items():
+        values = {str(value).strip() for value in values} - {''}
+        if key == 'ids':
+            if not all(value.isdigit() for value in values):
+                raise InvalidQuery('ids must be numbers')
+            values = {int(value) for value in values}
+        wanted[key] = values
+    count = sum(len(values) for values in wanted.values())
+    if not count:
+        raise InvalidQuery(f"Give at least one of {', '.join(BATCH_KEYS)}")
+    if count > settings.API_BATCH_SIZE:
+        raise InvalidQuery(f'At most {settings.API_BATCH_SIZE} values can be looked up at once')
+    return wanted
+
+@versioned_cache_page(API_CACHE_TIMEOUT, [CATALOG])
+@cache_tags(cdn.CATALOG)
+@require_http_methods(['GET', 'POST'])
+@csrf_exempt
+def api_products_batch(request):
+    """
+    The products with any of the given ``ids``, ``skus`` or ``slugs``
+    (comma-separated in the query string, or JSON lists in a POST body for
+    long lists), up to ``API_BATCH_SIZE`` values, read with one query. They
+    come in ``api_products`` order and form, ``?fields=`` included, and the
+    values that matched nothing are listed under ``missing``.
+    """
+    try:
+        fields = get_fields(request, PRODUCT_FIELDS)
+        wanted = _batch_values(request)
+        products, whole = _products_with_fields(fields, extra_columns=['sku', 'slug'])
+        condition = Q()
+        for key, field in BATCH_KEYS.items():
+            if wanted[key]:
+                condition |= Q(**{f'{field}__in': wanted[key]})
+        products = list(products.filter(condition).order_by(*[field for field, _ in PRODUCT_ORDERING]))
+
+        missing = {}
+        for key, field in BATCH_KEYS.items():
+            found = {getattr(product, field) for product in products}
+            missing[key] = sorted(wanted[key] - found)
+        if whole:
+            return HttpResponse(snapshots.page(products, None, {'missing': missing}), content_type='application/json')
+        return JsonResponse({'results': serialize(products, fields, PRODUCT_FIELDS), 'next': None, 'missing': missing})
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': 'Unable to fetch products'}, status=500)
 
-@cache_page(60 * 10)  # Cache for 10 minutes for API
+@versioned_cache_page(API_CACHE_TIMEOUT, [NAV])
+@cache_tags(cdn.NAV)
 @require_GET
 @csrf_exempt
 def api_categories(request):
     try:
-        # Only fetch necessary fields
-        categories = ProductCategory.objects.only('id', 'name', 'slug').all()
-        data = [{'id': c.id, 'name': c.name, 'slug': c.slug} for c in categories]
-        return JsonResponse(data, safe=False)
+        return HttpResponse(snapshots.get_list('categories'), content_type='application/json')
     except Exception as e:
         return JsonResponse({'error': 'Unable to fetch categories'}, status=500)
 
-@cache_page(60 * 5)  # Cache for 5 minutes for API
+BLOG_POST_ORDERING = [('published_date', True), ('id', True)]
+
+def _blog_posts_for_api(request, fields, since=None):
+    """Published posts matching the API filters; see ``_products_for_api``."""
+    whole = len(fields) == len(BLOG_POST_FIELDS)
+    if whole:
+        blog_posts = BlogPost.objects.only('api_json', *columns_for([], BLOG_POST_FIELDS, BLOG_POST_ORDERING))
+    else:
+        blog_posts = BlogPost.objects.only(*columns_for(fields, BLOG_POST_FIELDS, BLOG_POST_ORDERING))
+        if 'category' in fields:
+            blog_posts = blog_posts.select_related('category')
+    blog_posts = blog_posts.filter(status='published')
+
+    if request.GET.get('category'):
+        blog_posts = _filter_by_id_or_slug(blog_posts, 'category', request.GET['category'])
+    matching = search.matching_ids(search.BLOG_POST, request.GET.get('q', ''))
+    if matching is not None:
+        blog_posts = blog_posts.filter(pk__in=matching)
+    if since is not None:
+        blog_posts = sync.changed(blog_posts, since, BlogCategory)
+    return blog_posts, whole
+
+def _deleted_blog_posts(since):
+    # Posts taken out of publication are gone as far as the API is concerned.
+    unpublished = BlogPost.objects.filter(updated_at__gte=since).exclude(status='published')
+    return sorted(set(sync.deleted_ids(BlogPost, since)) | set(unpublished.values_list('pk', flat=True)))
+
+@versioned_cache_page(API_CACHE_TIMEOUT, [BLOG])
+@cache_tags(cdn.BLOG)
 @require_GET
 @csrf_exempt
 def api_blog_posts(request):
+    """
+    Published posts, newest first, a page at a time: ``?limit=``,
+    ``?cursor=``, ``?category=`` (id or slug), ``?q=``, ``?fields=`` and
+    ``?since=`` (see ``api_products``).
+    """
     try:
-        # Optimize query with select_related and only necessary fields
-        blog_posts = BlogPost.objects.select_related('category').only(
-            'id', 'title', 'slug', 'excerpt', 'author', 'published_date', 
-            'is_featured', 'featured_image', 'category__id', 'category__name'
-        ).filter(status='published').order_by('-published_date')
-        
-        data = []
-        for post in blog_posts:
-            data.append({
-                'id': post.id,
-                'title': post.title,
-                'slug': post.slug,
-                'excerpt': post.excerpt[:300] + '...' if len(post.excerpt) > 300 else post.excerpt,  # Limit excerpt length
-                'author': post.author,
-                'published_date': post.published_date.isoformat(),
-                'is_featured': post.is_featured,
-                'featured_image': post.featured_image.url if post.featured_image else None,
-                'category': {
-                    'id': post.category.id,
-                    'name': post.category.name,
-                } if post.category else None,
-                'tags': post.get_tags_list() if hasattr(post, 'get_tags_list') else [],
-            })
-        return JsonResponse(data, safe=False)
+        fields = get_fields(request, BLOG_POST_FIELDS)
+        since = sync.get_since(request)
+        blog_posts, whole = _blog_posts_for_api(request, fields, since)
+        page, next_url = keyset_page(request, blog_posts, BLOG_POST_ORDERING)
+        extra = sync.first_page_extra(request, since, lambda: {
+            'posts': _deleted_blog_posts(since),
+            'categories': sync.deleted_ids(BlogCategory, since),
+        })
+        if whole:
+            return HttpResponse(snapshots.page(page, next_url, extra), content_type='application/json')
+        return JsonResponse({'results': serialize(page, fields, BLOG_POST_FIELDS), 'next': next_url, **extra})
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': 'Unable to fetch blog posts'}, status=500)
 
-@cache_page(60 * 10)  # Cache for 10 minutes for API
+@conditional_page([BLOG])
+@cache_tags(cdn.BLOG)
+@require_GET
+@csrf_exempt
+def api_blog_posts_export(request):
+    """Every post matching the ``api_blog_posts`` filters, streamed as one JSON array."""
+    try:
+        fields = get_fields(request, BLOG_POST_FIELDS)
+        blog_posts, whole = _blog_posts_for_api(request, fields)
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    blog_posts = blog_posts.order_by(*[f'-{field}' for field, _ in BLOG_POST_ORDERING])
+    if whole:
+        return StreamingJsonResponse(encode_items(blog_posts, snapshots.fragment))
+    return StreamingJsonResponse(encode_items(blog_posts, lambda post: render_item(post, fields, BLOG_POST_FIELDS)))
+
+@cache_tags(cdn.CATALOG)
+@require_GET
+@csrf_exempt
+def api_autocomplete(request):
+    """
+    Up to ``?limit=`` products whose name or SKU starts with ``?q=``, then
+    those with a later word of the name starting with it, for typeahead.
+    Answered from the worker's in-memory index; see ``app/autocomplete.py``.
+    """
+    try:
+        limit = int(request.GET.get('limit') or autocomplete.DEFAULT_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    limit = max(1, min(limit, autocomplete.MAX_LIMIT))
+    response = HttpResponse(
+        autocomplete.suggestions(request.GET.get('q', ''), limit), content_type='application/json'
+    )
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+SEARCH_MODELS = {
+    search.PRODUCT: Product.objects.only('api_json', 'name'),
+    search.BLOG_POST: BlogPost.objects.only('api_json', 'title').filter(status='published'),
+}
+
+@versioned_cache_page(API_CACHE_TIMEOUT, [CATALOG, BLOG])
+@cache_tags(cdn.CATALOG, cdn.BLOG)
+@require_GET
+@csrf_exempt
+def api_search(request):
+    """
+    Products and published posts matching ``?q=``, best match first, each
+    with its score, a plain-text snippet and the item as in the list APIs.
+    ``?type=product`` or ``?type=blogpost`` searches one kind only;
+    ``?limit=`` and ``?cursor=`` page through the results.
+    """
+    try:
+        q = request.GET.get('q', '')
+        if search.match_expression(q) is None:
+            raise InvalidQuery('q is required')
+        kind = request.GET.get('type') or None
+        if kind is not None and kind not in SEARCH_MODELS:
+            raise InvalidQuery(f"type must be one of: {', '.join(SEARCH_MODELS)}")
+        limit = get_limit(request)
+        offset = 0
+        if request.GET.get('cursor'):
+            offset, = decode_cursor(request.GET['cursor'], 1)
+            if not isinstance(offset, int) or offset < 0:
+                raise InvalidQuery('Invalid cursor')
+
+        hits = search.search(q, kind, limit + 1, offset)
+        next_url = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_url = next_page_url(request, [offset + limit])
+        items = {
+            hit_kind: queryset.in_bulk([hit['id'] for hit in hits if hit['kind'] == hit_kind])
+            for hit_kind, queryset in SEARCH_MODELS.items()
+        }
+        results = [
+            b''.join([
+                b'{"type": ', snapshots.encode(hit['kind']),
+                b', "score": ', snapshots.encode(hit['score']),
+                b', "snippet": ', snapshots.encode(hit['snippet']),
+                b', "item": ', snapshots.fragment(items[hit['kind']][hit['id']]), b'}',
+            ])
+            for hit in hits if hit['id'] in items[hit['kind']]
+        ]
+        body = b'{"results": [' + b', '.join(results) + b'], "next": ' + snapshots.encode(next_url) + b'}'
+        return HttpResponse(body, content_type='application/json')
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': 'Unable to search'}, status=500)
+
+@versioned_cache_page(API_CACHE_TIMEOUT, [BLOG])
+@cache_tags(cdn.BLOG)
 @require_GET
 @csrf_exempt
 def api_blog_categories(request):
     try:
-        # Only fetch necessary fields
-        categories = BlogCategory.objects.only('id', 'name', 'slug').all()
-        data = [{'id': c.id, 'name': c.name, 'slug': c.slug} for c in categories]
-        return JsonResponse(data, safe=False)
+        return HttpResponse(snapshots.get_list('blog-categories'), content_type='application/json')
     except Exception as e:
         return JsonResponse({'error': 'Unable to fetch blog categories'}, status=500)
 
-
+@require_GET
+def resized_image(request, width, height, name):
+    """
+    The stored image ``name`` scaled to fit ``width`` x ``height``, in the
+    best format the client accepts; see ``app/image_resize.py``.
+    """
+    if (
+        (width, height) not in image_resize.allowed_sizes()
+        or not name.lower().endswith(image_resize.EXTENSIONS)
+        or '..' in name.split('/')
+    ):
+        raise Http404('No such image size')
+    try:
+        path, content_type = image_resize.get(name, width, height, request.headers.get('Accept', ''))
+    except image_resize.ImageNotFound:
+        raise Http404('No such image')
+    # The path may hold another image later, so clients revalidate.
+    etag = image_resize.etag(path)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.IMAGE_RESIZE_MAX_AGE)
+    patch_vary_headers(response, ['Accept'])
+    return response
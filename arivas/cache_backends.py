@@ -0,0 +1,277 @@
+"""
+Cache backend shared by every worker process on one machine.
+
+Entries live in a SQLite database in WAL mode on local disk, so all gunicorn
+workers read and write the same cache without running an external service.
+Each process keeps a small in-memory LRU in front of it to serve hot keys
+without touching SQLite; those copies are only trusted for ``L1_TIMEOUT``
+seconds, which bounds how long a worker can miss a write made by another.
+Lock keys (ending in ``.lock``, see ``app/cache.py``) are never copied, as
+other workers poll them to see the lock released.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL
+) WITHOUT ROWID
+"""
+
+# Keys never kept in the per-process LRU.
+L1_SKIP_SUFFIX = '.lock'
+
+
+class LRU:
+    """Thread-safe, size-limited map of key -> (expires, pickled value)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, expires):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache(BaseCache):
+    """
+    ``LOCATION`` is the path of the SQLite file. Supported ``OPTIONS``:
+
+    * ``MAX_ENTRIES`` / ``CULL_FREQUENCY``: as for Django's built-in backends.
+    * ``MAX_SIZE``: upper bound in bytes for the stored values (default 256 MB).
+    * ``L1_MAX_ENTRIES``: size of the per-process LRU, 0 disables it.
+    * ``L1_TIMEOUT``: seconds an entry may be served from the LRU.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = Path(location)
+        self.max_size = int(options.get('MAX_SIZE', 256 * 1024 * 1024))
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 2))
+        self.l1 = LRU(int(options.get('L1_MAX_ENTRIES', 1000)))
+        self._local = threading.local()
+        self._writes = 0
+
+    # --- connection handling ---
+
+    def _connection(self):
+        # Connections can't cross a fork, so key them by pid as well as thread.
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _expiry(self, timeout):
+        # Absolute expiry time, or None for keys that never expire.
+        return self.get_backend_timeout(timeout)
+
+    def _l1_put(self, key, value, expires):
+        if key.endswith(L1_SKIP_SUFFIX):
+            return
+        l1_expires = time.time() + self.l1_timeout
+        if expires is not None:
+            l1_expires = min(l1_expires, expires)
+        self.l1.set(key, value, l1_expires)
+
+    def _fetch(self, key):
+        """Return the pickled value for an already-made key, or None."""
+        now = time.time()
+        value = self.l1.get(key, now)
+        if value is not None:
+            return value
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return None
+        self._l1_put(key, row[0], row[1])
+        return row[0]
+
+    def _maybe_cull(self, conn):
+        self._writes += 1
+        if self._writes % self.cull_every:
+            return
+        now = time.time()
+        conn.execute('DELETE FROM cache_entries WHERE expires <= ?', (now,))
+        count, size = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+        ).fetchone()
+        if count <= self._max_entries and size <= self.max_size:
+            return
+        # Drop the entries closest to expiry first; keys stored without a
+        # timeout (such as page cache versions) sort last.
+        if self._cull_frequency == 0:
+            conn.execute('DELETE FROM cache_entries')
+            self.l1.clear()
+            return
+        drop = max(count // self._cull_frequency, count - self._max_entries)
+        conn.execute(
+            """
+            DELETE FROM cache_entries WHERE key IN (
+                SELECT key FROM cache_entries
+                ORDER BY expires IS NULL, expires LIMIT ?
+            )
+            """,
+            (drop,),
+        )
+        while size > self.max_size:
+            row = conn.execute(
+                """
+                SELECT key, size FROM cache_entries
+                ORDER BY expires IS NULL, expires LIMIT 1
+                """
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (row[0],))
+            size -= row[1]
+
+    def _store(self, key, value, timeout, only_if_missing=False):
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        expires = self._expiry(timeout)
+        conn = self._connection()
+        params = (key, pickled, len(pickled), expires)
+        if only_if_missing:
+            # Overwrite an expired row, but never a live one.
+            cursor = conn.execute(
+                """
+                INSERT INTO cache_entries (key, value, size, expires)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value,
+                    size = excluded.size,
+                    expires = excluded.expires
+                WHERE cache_entries.expires <= ?
+                """,
+                params + (time.time(),),
+            )
+            if cursor.rowcount == 0:
+                return False
+        else:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, size, expires) '
+                'VALUES (?, ?, ?, ?)',
+                params,
+            )
+        self._l1_put(key, pickled, expires)
+        self._maybe_cull(conn)
+        return True
+
+    # --- cache API ---
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._store(key, value, timeout, only_if_missing=True)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = self._fetch(key)
+        if pickled is None:
+            return default
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._store(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'UPDATE cache_entries SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), key, time.time()),
+        )
+        self.l1.delete(key)
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.l1.delete(key)
+        cursor = self._connection().execute(
+            'DELETE FROM cache_entries WHERE key = ?', (key,)
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._fetch(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent
+        # increments from other workers serialize instead of losing updates.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(new_value, self.pickle_protocol)
+            conn.execute(
+                'UPDATE cache_entries SET value = ?, size = ? WHERE key = ?',
+                (pickled, len(pickled), key),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._l1_put(key, pickled, row[1])
+        return new_value
+
+    def clear(self):
+        self.l1.clear()
+        self._connection().execute('DELETE FROM cache_entries')
+
+    def close(self, **kwargs):
+        # Connections are reused across requests; nothing to do per request.
+        pass
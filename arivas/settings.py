@@ -31,6 +31,16 @@ def env_str(name, default=None, required=False):
     return val.strip()
 
 
+def env_int(name, default=0):
+    val = os.getenv(name)
+    if not val:
+        return default
+    try:
+        return int(val)
+    except ValueError:
+        raise ImproperlyConfigured(f"Env {name} must be an integer")
+
+
 def env_list(name, default=None):
     val = os.getenv(name)
     if not val:
@@ -84,6 +94,9 @@ if USE_R2 and "storages" not in INSTALLED_APPS:
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Gzips text responses that aren't served precompressed from the page
+    # cache (see app/compression.py).
+    "app.compression.TextGZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -172,6 +185,39 @@ WHITENOISE_MANIFEST_STRICT = True
 MEDIA_URL = R2_PUBLIC_MEDIA_URL.rstrip("/") + "/" if USE_R2 and R2_PUBLIC_MEDIA_URL else "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Widths (px) and formats of the resized copies made of product and blog
+# images for srcset; formats Pillow can't write are skipped.
+IMAGE_DERIVATIVE_WIDTHS = [int(w) for w in env_list("IMAGE_DERIVATIVE_WIDTHS", ["320", "640", "960", "1280"])]
+IMAGE_DERIVATIVE_FORMATS = env_list("IMAGE_DERIVATIVE_FORMATS", ["avif", "webp"])
+# Uploads are stored at most IMAGE_MAX_DIMENSION px a side; images of more
+# than IMAGE_MAX_PIXELS pixels are refused, which caps the memory a PNG or
+# other non-JPEG upload takes to decode (about 4 bytes per pixel). Each
+# process decodes at most IMAGE_DECODE_CONCURRENCY images at a time.
+IMAGE_MAX_DIMENSION = env_int("IMAGE_MAX_DIMENSION", 2048)
+IMAGE_MAX_PIXELS = env_int("IMAGE_MAX_PIXELS", 50_000_000)
+IMAGE_DECODE_CONCURRENCY = env_int("IMAGE_DECODE_CONCURRENCY", 1)
+# Where uploaded images are cropped and resized: "thread" (background threads
+# of the web worker), "worker" (`manage.py process_images`) or "sync" (while
+# the admin request waits).
+IMAGE_PROCESSING = env_str("IMAGE_PROCESSING", "thread")
+IMAGE_PROCESSING_THREADS = env_int("IMAGE_PROCESSING_THREADS", 1)
+# Images still "processing" this many seconds after being claimed are taken
+# to belong to a dead worker, and `manage.py process_images` (or, in "thread"
+# mode, the next image job) queues them again.
+IMAGE_PROCESSING_TIMEOUT = env_int("IMAGE_PROCESSING_TIMEOUT", 15 * 60)
+# New uploads wait here, outside MEDIA_ROOT and the media bucket, until they
+# are processed, so the original file (EXIF, GPS) is never public. The web
+# workers and `manage.py process_images` must see the same directory.
+IMAGE_UPLOAD_DIR = env_str("IMAGE_UPLOAD_DIR", str(BASE_DIR / "uploads"))
+# /img/<width>x<height>/<path> resizes stored images on request, for the
+# sizes listed here only. Results are kept on local disk up to
+# IMAGE_RESIZE_CACHE_MAX_SIZE_MB, least recently used dropped first.
+IMAGE_RESIZE_SIZES = env_list("IMAGE_RESIZE_SIZES", ["160x160", "320x320", "640x640", "960x960", "1280x1280"])
+IMAGE_RESIZE_CACHE_DIR = env_str("IMAGE_RESIZE_CACHE_DIR", str(BASE_DIR / "cache" / "images"))
+IMAGE_RESIZE_CACHE_MAX_SIZE = env_int("IMAGE_RESIZE_CACHE_MAX_SIZE_MB", 512) * 1024 * 1024
+# Browsers and the CDN revalidate them (ETag) after IMAGE_RESIZE_MAX_AGE.
+IMAGE_RESIZE_MAX_AGE = env_int("IMAGE_RESIZE_MAX_AGE", 60 * 60 * 24)
+
 
 # --- DATABASE ---
 DATABASES = {
@@ -182,6 +228,90 @@ DATABASES = {
 }
 
 
+# --- CACHE ---
+# By default every gunicorn worker on the node shares one SQLite-backed cache
+# file. SHARED_CACHE=False falls back to per-process memory caches, which only
+# suits a single process (e.g. runserver): no other worker would see the
+# version bumps that invalidate cached pages (see app/checks.py).
+SHARED_CACHE = env_bool("SHARED_CACHE", True)
+
+if SHARED_CACHE:
+    CACHES = {
+        "default": {
+            "BACKEND": "arivas.cache_backends.SQLiteCache",
+            "LOCATION": env_str("CACHE_LOCATION", str(BASE_DIR / "cache" / "cache.sqlite3")),
+            "OPTIONS": {
+                "MAX_ENTRIES": env_int("CACHE_MAX_ENTRIES", 20000),
+                "MAX_SIZE": env_int("CACHE_MAX_SIZE_MB", 256) * 1024 * 1024,
+                "L1_MAX_ENTRIES": env_int("CACHE_L1_MAX_ENTRIES", 1000),
+                "L1_TIMEOUT": env_int("CACHE_L1_TIMEOUT", 2),
+            },
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Page cache entries are keyed by content versions that model signals bump
+# on every save (see app/cache.py), so they can live for a long time in the
+# shared cache. Per-process caches keep them only as long as before versioning.
+PAGE_CACHE_ALIAS = "default"
+PAGE_CACHE_TIMEOUT = env_int("PAGE_CACHE_TIMEOUT", 60 * 60 * 24 if SHARED_CACHE else 60 * 15)
+API_CACHE_TIMEOUT = env_int("API_CACHE_TIMEOUT", 60 * 60 * 24 if SHARED_CACHE else 60 * 15)
+# After a page expires it is served stale for up to PAGE_CACHE_GRACE seconds
+# while a single worker renders the new copy (0 disables serving stale).
+PAGE_CACHE_GRACE = env_int("PAGE_CACHE_GRACE", 60 * 60 if SHARED_CACHE else 0)
+PAGE_CACHE_LOCK_TIMEOUT = env_int("PAGE_CACHE_LOCK_TIMEOUT", 30)
+PAGE_CACHE_MISS_WAIT = env_int("PAGE_CACHE_MISS_WAIT", 5)
+# Pages carry ETag/Last-Modified, so browsers can revalidate cheaply.
+BROWSER_CACHE_TIMEOUT = env_int("BROWSER_CACHE_TIMEOUT", 0)
+# Compiled PageSEO templates kept per worker by render_dynamic_content.
+DYNAMIC_TEMPLATE_CACHE_SIZE = env_int("DYNAMIC_TEMPLATE_CACHE_SIZE", 64)
+# Turned on by `manage.py export_site` while it renders: pages then leave out
+# links a static host can't serve, such as ?cursor= pages.
+STATIC_EXPORT = False
+
+
+# --- CDN ---
+# Cloudflare may keep pages for EDGE_CACHE_TIMEOUT seconds (s-maxage, 0 to
+# disable); model saves purge them by the tags in CDN_CACHE_TAG_HEADER.
+EDGE_CACHE_TIMEOUT = env_int("EDGE_CACHE_TIMEOUT", 0)
+CDN_CACHE_TAG_HEADER = env_str("CDN_CACHE_TAG_HEADER", "Cache-Tag")
+
+CLOUDFLARE_ZONE_ID = env_str("CLOUDFLARE_ZONE_ID", "")
+CLOUDFLARE_API_TOKEN = env_str("CLOUDFLARE_API_TOKEN", "")
+CDN_PURGE_LOG = env_str("CDN_PURGE_LOG", "")
+
+if CLOUDFLARE_ZONE_ID and CLOUDFLARE_API_TOKEN:
+    CDN_PURGER = {
+        "BACKEND": "app.cdn.CloudflarePurger",
+        "OPTIONS": {"ZONE_ID": CLOUDFLARE_ZONE_ID, "API_TOKEN": CLOUDFLARE_API_TOKEN},
+    }
+elif CDN_PURGE_LOG:
+    CDN_PURGER = {"BACKEND": "app.cdn.FilePurger", "OPTIONS": {"PATH": CDN_PURGE_LOG}}
+else:
+    CDN_PURGER = {"BACKEND": "app.cdn.LogPurger"}
+# Purges are sent from a background thread; a failed one is tried again up
+# to CDN_PURGE_RETRIES times, waiting CDN_PURGE_RETRY_DELAY seconds, then
+# twice as long each time.
+CDN_PURGE_RETRIES = env_int("CDN_PURGE_RETRIES", 3)
+CDN_PURGE_RETRY_DELAY = env_int("CDN_PURGE_RETRY_DELAY", 2)
+
+
+# --- API ---
+# Items per page of the JSON list APIs, and the most a client may ask for.
+API_PAGE_SIZE = env_int("API_PAGE_SIZE", 24)
+API_MAX_PAGE_SIZE = env_int("API_MAX_PAGE_SIZE", 100)
+# Most ids, SKUs and slugs one request to the batch lookup API may ask for.
+API_BATCH_SIZE = env_int("API_BATCH_SIZE", 500)
+# Deleted rows are reported to ?since= syncs for this many days; clients
+# that last synced earlier must fetch the full lists again.
+API_DELETION_RETENTION_DAYS = env_int("API_DELETION_RETENTION_DAYS", 90)
+
+
 # --- URLS / WSGI ---
 ROOT_URLCONF = "arivas.urls"
 WSGI_APPLICATION = "arivas.wsgi.application"
@@ -198,6 +328,8 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "app.context_processors.navigation",
+                "app.context_processors.page_cache_csrf",
             ],
         },
     }
@@ -38,14 +38,20 @@ urlpatterns = [
     path('blog/<slug:slug>/', views.individual_blog, name='individual_blog'),
     path('price-list/', views.price_list, name='price_list'),
     path('enquiry/', views.enquiry, name='enquiry'),
+    path('img/<int:width>x<int:height>/<path:name>', views.resized_image, name='resized_image'),
 
     
 
     # Public APIs
     path('api/products/', views.api_products, name='api_products'),
+    path('api/products/export/', views.api_products_export, name='api_products_export'),
+    path('api/products/batch/', views.api_products_batch, name='api_products_batch'),
     path('api/categories/', views.api_categories, name='api_categories'),
     path('api/blog-posts/', views.api_blog_posts, name='api_blog_posts'),
+    path('api/blog-posts/export/', views.api_blog_posts_export, name='api_blog_posts_export'),
     path('api/blog-categories/', views.api_blog_categories, name='api_blog_categories'),
+    path('api/search/', views.api_search, name='api_search'),
+    path('api/autocomplete/', views.api_autocomplete, name='api_autocomplete'),
 ]
 
 
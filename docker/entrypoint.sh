@@ -6,6 +6,21 @@ mkdir -p /app/staticfiles
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput --clear --verbosity 2
 
+# Fill the shared page cache in the background while Gunicorn starts.
+case "${WARM_CACHE:-False}" in
+  [Tt]rue|1|[Yy]es|[Oo]n)
+    python manage.py warm_cache --concurrency ${WARM_CACHE_CONCURRENCY:-2} --rate ${WARM_CACHE_RATE:-10} &
+    ;;
+esac
+
+# Process uploaded images outside the web workers, or else catch up on
+# those a previous container left pending.
+if [ "${IMAGE_PROCESSING:-thread}" = "worker" ]; then
+  python manage.py process_images &
+else
+  python manage.py process_images --once &
+fi
+
 exec gunicorn arivas.wsgi:application \
   --bind 0.0.0.0:${PORT:-8080} \
   --workers ${GUNICORN_WORKERS:-3} \
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Compare serializing the product list per request with joining the stored API JSON."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "arivas.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import JsonResponse  # noqa: E402
+from django.utils.html import strip_tags  # noqa: E402
+
+from app import snapshots  # noqa: E402
+from app.models import Product  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark api_products serialization against stored JSON snapshots")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000],
+        help="Catalog sizes to simulate (default: 10000 100000).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is reported.")
+    return parser.parse_args()
+
+
+def legacy_loop(products: list[Product]) -> bytes:
+    """The api_products body as it was built before snapshots: every row, every request."""
+    data = []
+    for p in products:
+        data.append({
+            "id": p.id,
+            "name": strip_tags(p.name),
+            "slug": p.slug,
+            "description": strip_tags(p.description)[:200] + "..." if len(strip_tags(p.description)) > 200 else strip_tags(p.description),
+            "image": p.image.url if p.image else "",
+            "category": {
+                "id": p.category.id,
+                "name": strip_tags(p.category.name),
+                "slug": p.category.slug,
+            } if p.category else None,
+        })
+    return JsonResponse(data, safe=False).content
+
+
+def joined(fragments: list[bytes]) -> bytes:
+    return b"[" + b", ".join(fragments) + b"]"
+
+
+def best(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    args = parse_args()
+
+    templates = list(Product.objects.select_related("category"))
+    if not templates:
+        raise SystemExit("No products in the database to build a catalog from.")
+
+    for size in args.sizes:
+        # In-memory copies of the real products, so descriptions have
+        # realistic length and markup; nothing is written to the database.
+        products = []
+        for i, template in enumerate(islice(cycle(templates), size), start=1):
+            product = Product(
+                id=i,
+                name=template.name,
+                slug=f"{template.slug}-{i}",
+                description=template.description,
+                image=template.image.name,
+            )
+            product.category = template.category
+            products.append(product)
+
+        build = best(lambda: [snapshots.build(p) for p in products], 1)
+        fragments = [snapshots.build(p) for p in products]
+        assert joined(fragments) == legacy_loop(products)
+
+        legacy = best(lambda: legacy_loop(products), args.repeat)
+        snapshot = best(lambda: joined(fragments), args.repeat)
+        body = joined(fragments)
+
+        print(f"{size} products, {len(body) / 1024 / 1024:.1f} MB of JSON")
+        print(f"  serialize per request: {legacy * 1000:9.1f} ms")
+        print(f"  join stored JSON:      {snapshot * 1000:9.1f} ms  ({legacy / snapshot:.0f}x faster)")
+        print(f"  build all snapshots:   {build * 1000:9.1f} ms  ({build / size * 1e6:.1f} us per product save)")
+
+
+if __name__ == "__main__":
+    main()
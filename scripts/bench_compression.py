@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Bytes and CPU per page cache hit: uncompressed, precompressed, and compressed per request."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "arivas.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.utils.text import compress_string  # noqa: E402
+
+from app import compression  # noqa: E402
+
+DEFAULT_PATHS = ["/", "/products/", "/about/", "/blog/", "/api/products/", "/api/categories/"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark page cache hits with and without precompressed variants")
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS, help="Paths to request (default: a few pages and APIs).")
+    parser.add_argument("-n", "--number", type=int, default=200, help="Requests per measurement.")
+    parser.add_argument("--host", help="Host header (default: first usable ALLOWED_HOSTS entry).")
+    return parser.parse_args()
+
+
+def cpu_per_call(func, number: int) -> float:
+    start = time.process_time()
+    for _ in range(number):
+        func()
+    return (time.process_time() - start) / number
+
+
+def main() -> None:
+    args = parse_args()
+    host = args.host or next(
+        (h for h in settings.ALLOWED_HOSTS if h and h != "*" and not h.startswith(".")),
+        "localhost",
+    )
+    client = Client(HTTP_HOST=host)
+    accepts = [("identity", ""), ("gzip", "gzip")]
+    if compression.brotli is not None:
+        accepts.append(("br", "gzip, deflate, br"))
+    else:
+        print("brotli is not installed; only gzip variants are stored.\n")
+
+    print(f"{'path':<22} {'encoding':<9} {'bytes':>9} {'hit CPU':>10} {'+ per-request compression':>27}")
+    for path in args.paths:
+        response = client.get(path)  # fill the page cache
+        if response.status_code != 200 or response.streaming:
+            print(f"{path:<22} skipped ({response.status_code})")
+            continue
+        body = response.content
+
+        for name, accept in accepts:
+            hit = client.get(path, HTTP_ACCEPT_ENCODING=accept)
+            size = len(hit.content)
+            cpu = cpu_per_call(lambda: client.get(path, HTTP_ACCEPT_ENCODING=accept), args.number)
+            # What compressing the cached body on every hit would add instead:
+            # GZipMiddleware's gzip, or brotli at the stored quality.
+            if name == "gzip":
+                extra = cpu_per_call(lambda: compress_string(body, max_random_bytes=100), args.number)
+            elif name == "br":
+                extra = cpu_per_call(lambda: compression.brotli.compress(body, quality=compression.BROTLI_QUALITY), args.number)
+            else:
+                extra = 0.0
+            extra_text = f"{extra * 1e6:9.0f} us" if extra else ""
+            print(f"{path:<22} {name:<9} {size:>9} {cpu * 1e6:>7.0f} us {extra_text:>27}")
+
+
+if __name__ == "__main__":
+    main()
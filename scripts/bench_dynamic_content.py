@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Compare parsing PageSEO content on every render with the compiled-template cache."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "arivas.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.template import Context, Template  # noqa: E402
+
+from app.context_processors import get_navigation  # noqa: E402
+from app.models import PageSEO  # noqa: E402
+from app.views import compile_dynamic_content  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark render_dynamic_content with and without the template cache")
+    parser.add_argument("--slug", default="about", help="PageSEO slug whose content1 is rendered (default: about).")
+    parser.add_argument("-n", "--number", type=int, default=500, help="Renders per measurement.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    page = PageSEO.objects.filter(slug=args.slug).first()
+    if page is None or not page.content1:
+        raise SystemExit(f"No PageSEO content found for slug '{args.slug}'")
+
+    content = page.content1
+    context = {"product_categories": get_navigation()}
+
+    def parse_and_render():
+        Template("{% load custom_filters %}" + content).render(Context(context))
+
+    def cached_render():
+        compile_dynamic_content(content).render(Context(context))
+
+    compile_dynamic_content(content)
+    parsed = min(timeit.repeat(parse_and_render, number=args.number, repeat=3)) / args.number
+    cached = min(timeit.repeat(cached_render, number=args.number, repeat=3)) / args.number
+
+    print(f"content: {len(content)} chars from PageSEO '{args.slug}'")
+    print(f"parse + render: {parsed * 1e6:9.1f} us/render")
+    print(f"cached render:  {cached * 1e6:9.1f} us/render")
+    print(f"speedup:        {parsed / cached:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""Peak memory of processing large uploads: full-resolution decode against the bounded pipeline."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "arivas.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.files.storage import InMemoryStorage  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from app import images  # noqa: E402
+
+OPERATIONS = ["legacy", "job", "resize"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark peak RSS of image processing on large synthetic uploads")
+    parser.add_argument(
+        "--megapixels",
+        type=int,
+        nargs="+",
+        default=[12, 24, 40, 60],
+        help="Sizes of the synthetic 4:3 photos (default: 12 24 40 60).",
+    )
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        choices=["jpeg", "png"],
+        default=["jpeg", "png"],
+        help="Upload formats to try (default: jpeg png).",
+    )
+    parser.add_argument("--measure", nargs=2, metavar=("OPERATION", "PATH"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def synthetic_photo(megapixels: int, fmt: str, directory: str) -> str:
+    """A 4:3 image with noise over gradients, tagged as shot rotated (EXIF orientation 6)."""
+    height = int((megapixels * 1_000_000 * 3 / 4) ** 0.5)
+    width = height * 4 // 3
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 32)
+    img = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    path = os.path.join(directory, f"{megapixels}mp.{fmt}")
+    if fmt == "jpeg":
+        img.save(path, quality=90, exif=exif)
+    else:
+        img.save(path, compress_level=1, exif=exif)
+    return path
+
+
+def legacy(f) -> None:
+    """What processing did before: full decode, full-size crop, derivatives from the full-size square."""
+    img = Image.open(f)
+    side = min(img.size)
+    left, top = (img.width - side) // 2, (img.height - side) // 2
+    img = img.crop((left, top, left + side, top + side))
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=images.JPEG_QUALITY)
+    img = Image.open(BytesIO(buffer.getvalue()))
+    for width in settings.IMAGE_DERIVATIVE_WIDTHS:
+        for fmt in images.derivative_formats():
+            resized = img.resize((width, width), Image.Resampling.LANCZOS)
+            resized.save(BytesIO(), **images.FORMATS[fmt])
+
+
+def job(f) -> None:
+    """What app/image_jobs.py does for a product upload, into memory instead of the media storage."""
+    data, extension = images.process_upload(f, square=True)
+    images.make_derivatives(BytesIO(data), "products/upload" + extension, InMemoryStorage())
+
+
+def resize(f) -> None:
+    """A miss of the /img/640x640/ endpoint (app/image_resize.py) straight from the upload."""
+    img = images.reduce(images.open_image(f, (640, 640)), (640, 640))
+    images.fit(img, (640, 640))
+    img = images.finish(img)
+    img.save(BytesIO(), format="JPEG", quality=images.JPEG_QUALITY)
+
+
+def peak_rss_kb() -> int:
+    """This process's peak RSS. VmHWM, unlike ru_maxrss, starts over when a process is exec'd."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(operation: str, path: str) -> None:
+    """Run one operation in this (fresh) process and print its peak RSS growth in MB and its time."""
+    func = globals()[operation]
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            func(f)
+        outcome = "ok"
+    except images.ImageTooLarge:
+        outcome = "refused"
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    print(f"{(peak - baseline) / 1024:.1f} {elapsed:.2f} {outcome}")
+
+
+def main() -> None:
+    args = parse_args()
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    print(
+        f"IMAGE_MAX_PIXELS={settings.IMAGE_MAX_PIXELS:,} IMAGE_MAX_DIMENSION={settings.IMAGE_MAX_DIMENSION} "
+        f"derivative formats: {', '.join(images.derivative_formats()) or 'none'}\n"
+    )
+    print(f"{'upload':<14} {'operation':<9} {'peak RSS +':>11} {'time':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in args.formats:
+            for megapixels in args.megapixels:
+                path = synthetic_photo(megapixels, fmt, directory)
+                label = f"{megapixels} MP {fmt}"
+                for operation in OPERATIONS:
+                    # A new process each time: the peak never goes down.
+                    result = subprocess.run(
+                        [sys.executable, __file__, "--measure", operation, path],
+                        capture_output=True, text=True, check=True,
+                    )
+                    peak, elapsed, outcome = result.stdout.split()[-3:]
+                    note = "" if outcome == "ok" else f"  ({outcome})"
+                    print(f"{label:<14} {operation:<9} {float(peak):>8.0f} MB {float(elapsed):>7.2f}s{note}")
+                os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()